@@ -1,11 +1,21 @@
 import os
+import uuid
+from datetime import datetime
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
-from model_utils import run_model_pipeline, load_model, make_predictions, get_model_metrics
-from chat_engine import respond_to_query, get_dynamic_suggestions, get_auto_insights, get_chat_answer
+from model_search import run_search
+from model_utils import run_model_pipeline, load_model, load_model_metadata, get_model_load_stats, get_cached_predictions, get_model_metrics, activate_model, rollback_model, ESTIMATORS, DEFAULT_ESTIMATOR, HOLDOUT_MONTHS
+from model_registry import list_versions
+from chat_engine import respond_to_query, get_dynamic_suggestions, stream_auto_insights, stream_chat_answer
+from gemini_helper import get_llm_status, get_llm_queue_metrics
+from llm_scheduler import set_session_id
+from data_utils import (
+    load_dataset, get_dataset_cache_stats, build_aggregation_cube, cube_view,
+    group_metric, total_metric, filter_frame
+)
 
 # -------------------- PAGE CONFIG --------------------
 st.set_page_config(
@@ -16,7 +26,7 @@ st.set_page_config(
 )
 
 # -------------------- API KEY CHECK --------------------
-if not os.getenv("GEMINI_API_KEY"):
+if not os.getenv("GEMINI_API_KEY") and os.getenv("LLM_BACKEND", "gemini").lower() != "stub":
     st.error("Gemini API key not configured. Please set GEMINI_API_KEY.")
     st.stop()
 
@@ -24,6 +34,11 @@ if not os.getenv("GEMINI_API_KEY"):
 if "theme" not in st.session_state:
     st.session_state.theme = "light"
 
+# Tag this session's LLM requests so the shared rate limiter can schedule sessions fairly
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+set_session_id(st.session_state.session_id)
+
 def toggle_theme():
     st.session_state.theme = "dark" if st.session_state.theme == "light" else "light"
 
@@ -724,7 +739,23 @@ with st.sidebar:
 # -------------------- LOAD DATA --------------------
 df = None
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
+    with st.sidebar:
+        progress_slot = st.empty()
+    
+    def show_load_progress(fraction):
+        progress_slot.progress(fraction, text=f"Reading CSV... {fraction*100:.0f}%")
+    
+    try:
+        df, dataset_hash = load_dataset(uploaded_file, progress=show_load_progress)
+    except ValueError as e:
+        # Checked on the first chunk, so a wrong file is rejected before it is fully read
+        df = None
+        st.sidebar.error(f"⚠️ {e}")
+    progress_slot.empty()
+    
+    cache_stats = get_dataset_cache_stats()
+    with st.sidebar:
+        st.caption(f"Dataset cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
 
 # -------------------- HELPERS --------------------
 def fmt(n):
@@ -734,7 +765,7 @@ def fmt(n):
         return f"{n/1_000:.0f}K"
     return str(int(n))
 
-def show_insight(text):
+def parse_insight(text):
     parts = {"Finding": "", "Impact": "", "Recommendation": ""}
     curr = None
     for line in text.split("\n"):
@@ -749,8 +780,12 @@ def show_insight(text):
         else:
             if curr:
                 parts[curr] += " " + line
-    
-    st.markdown(f"""
+    return parts
+
+def show_insight(text, container=None):
+    # Also called with partial text while an insight is streaming in
+    parts = parse_insight(text)
+    (container or st).markdown(f"""
     <div class="insight-box">
         <span class="insight-tag">AI Insight</span>
         <div class="insight-section">
@@ -768,8 +803,15 @@ def show_insight(text):
     </div>
     """, unsafe_allow_html=True)
 
-def render_suggestions_card(text):
-    st.markdown(f"""
+def render_answer(question, answer, container=None):
+    (container or st).markdown(
+        f'<div class="question-box"><div class="q-label">Your Question</div><div class="q-text">{question}</div></div>'
+        f'<div class="answer-box"><div class="answer-label">💡 Answer</div><div class="answer-text">{answer}</div></div>',
+        unsafe_allow_html=True
+    )
+
+def render_suggestions_card(text, container=None):
+    (container or st).markdown(f"""
     <div class="insight-box" style="border-left-color: #10b981;">
         <span class="insight-tag" style="background: rgba(16, 185, 129, 0.15); color: #10b981;">Strategic Suggestions</span>
         <div class="insight-section-text">{text.replace("Suggestions:", "").strip()}</div>
@@ -796,9 +838,10 @@ if page == "📊 Dashboard":
         </div>
         """, unsafe_allow_html=True)
     else:
-        # Get column types
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+        # Aggregates are precomputed once per dataset
+        cube = build_aggregation_cube(df)
+        numeric_cols = cube["numeric_cols"]
+        categorical_cols = cube["categorical_cols"]
         
         # Column Selection Section
         st.markdown('<div class="filter-section">', unsafe_allow_html=True)
@@ -834,17 +877,20 @@ if page == "📊 Dashboard":
             st.warning("⚠️ No numeric columns found in your dataset. Please upload a dataset with numeric values.")
         else:
             # Calculate dynamic stats
-            total = df[primary_metric].sum() if primary_metric else 0
-            avg_val = df[primary_metric].mean() if primary_metric else 0
-            max_val = df[primary_metric].max() if primary_metric else 0
-            min_val = df[primary_metric].min() if primary_metric else 0
-            record_count = len(df)
+            full_view = cube_view(cube)
+            total = total_metric(full_view, primary_metric) if primary_metric else 0
+            avg_val = total_metric(full_view, primary_metric, "mean") if primary_metric else 0
+            max_val = total_metric(full_view, primary_metric, "max") if primary_metric else 0
+            min_val = total_metric(full_view, primary_metric, "min") if primary_metric else 0
+            record_count = full_view["records"]
             
             # Group-based stats
             has_groups = group_col and group_col != "No categorical columns" and group_col in df.columns
             if has_groups:
-                unique_groups = df[group_col].nunique()
-                top_group = df.groupby(group_col)[primary_metric].sum().idxmax() if primary_metric else "N/A"
+                group_view = cube_view(cube, group_col)
+                group_sums = group_metric(group_view, primary_metric)
+                unique_groups = len(group_sums)
+                top_group = group_sums.idxmax() if primary_metric and len(group_sums) else "N/A"
             else:
                 unique_groups = 0
                 top_group = "N/A"
@@ -856,7 +902,7 @@ if page == "📊 Dashboard":
                     st.markdown(f'<span class="filter-label">🔍 Filter by {group_col}</span>', unsafe_allow_html=True)
                     selected = st.multiselect(
                         "Select items", 
-                        sorted(df[group_col].dropna().unique()),
+                        group_sums.index.tolist(),
                         label_visibility="collapsed",
                         placeholder=f"All {group_col}s Selected"
                     )
@@ -865,10 +911,10 @@ if page == "📊 Dashboard":
                     st.info(f"{len(selected) if selected else unique_groups} Groups")
                 st.markdown('</div>', unsafe_allow_html=True)
                 
-                fdf = df if not selected else df[df[group_col].isin(selected)]
+                view = cube_view(cube, group_col, selected)
             else:
-                fdf = df
                 selected = []
+                view = full_view
             
             # KPI Cards Grid
             st.markdown('<div class="kpi-grid">', unsafe_allow_html=True)
@@ -927,13 +973,14 @@ if page == "📊 Dashboard":
             
             # Age Demographics (if available)
             age_cols = ['age_0_5', 'age_5_17', 'age_18_greater']
-            if all(col in fdf.columns for col in age_cols):
+            has_age_cols = all(col in numeric_cols for col in age_cols)
+            if has_age_cols:
                 st.markdown('<div class="section-title">👥 Age Demographics</div>', unsafe_allow_html=True)
                 demo_cols = st.columns(3)
                 
-                age_0_5 = fdf['age_0_5'].sum()
-                age_5_17 = fdf['age_5_17'].sum()
-                age_18_plus = fdf['age_18_greater'].sum()
+                age_0_5 = total_metric(view, 'age_0_5')
+                age_5_17 = total_metric(view, 'age_5_17')
+                age_18_plus = total_metric(view, 'age_18_greater')
                 total_age = age_0_5 + age_5_17 + age_18_plus
                 
                 with demo_cols[0]:
@@ -953,7 +1000,7 @@ if page == "📊 Dashboard":
             with c1:
                 if has_groups and primary_metric:
                     st.markdown(f'<div class="chart-card"><div class="chart-card-header"><div class="chart-card-title">🏆 Top 10 {group_col} by {primary_metric}</div></div></div>', unsafe_allow_html=True)
-                    sdata = fdf.groupby(group_col)[primary_metric].sum().reset_index()
+                    sdata = group_metric(view, primary_metric).rename(primary_metric).reset_index()
                     sdata = sdata.sort_values(primary_metric, ascending=True).tail(10)
                     
                     fig = px.bar(sdata, y=group_col, x=primary_metric, orientation="h", color_discrete_sequence=["#f97316"])
@@ -962,7 +1009,7 @@ if page == "📊 Dashboard":
                     st.plotly_chart(fig, use_container_width=True)
             
             with c2:
-                if all(col in fdf.columns for col in age_cols):
+                if has_age_cols:
                     st.markdown('<div class="chart-card"><div class="chart-card-header"><div class="chart-card-title">📊 Age Distribution</div></div></div>', unsafe_allow_html=True)
                     pie_data = pd.DataFrame({"Age Group": ["0-5 Years", "5-17 Years", "18+ Years"], "Count": [age_0_5, age_5_17, age_18_plus]})
                     
@@ -971,7 +1018,7 @@ if page == "📊 Dashboard":
                     st.plotly_chart(fig, use_container_width=True)
                 elif additional_metrics:
                     st.markdown('<div class="chart-card"><div class="chart-card-header"><div class="chart-card-title">📊 Metrics Distribution</div></div></div>', unsafe_allow_html=True)
-                    pie_data = pd.DataFrame({"Metric": additional_metrics[:5], "Value": [fdf[m].sum() for m in additional_metrics[:5]]})
+                    pie_data = pd.DataFrame({"Metric": additional_metrics[:5], "Value": [total_metric(view, m) for m in additional_metrics[:5]]})
                     
                     fig = px.pie(pie_data, values="Value", names="Metric", hole=0.65, color_discrete_sequence=["#6366f1", "#14b8a6", "#f97316", "#8b5cf6", "#ec4899"])
                     fig.update_layout(plot_bgcolor=colors["chart_bg"], paper_bgcolor="rgba(0,0,0,0)", margin=dict(l=0, r=0, t=10, b=0), height=320, showlegend=True, font=dict(color=colors["text_secondary"]), legend=dict(orientation="h", yanchor="bottom", y=-0.15, xanchor="center", x=0.5))
@@ -981,7 +1028,7 @@ if page == "📊 Dashboard":
             if has_groups:
                 st.markdown(f'<div class="section-title">🗺️ {group_col} Performance</div>', unsafe_allow_html=True)
                 
-                group_data = fdf.groupby(group_col)[primary_metric].sum().reset_index()
+                group_data = group_metric(view, primary_metric).rename(primary_metric).reset_index()
                 group_data = group_data.sort_values(primary_metric, ascending=False)
                 
                 st.markdown('<div class="state-grid">', unsafe_allow_html=True)
@@ -1005,7 +1052,8 @@ if page == "📊 Dashboard":
             
             # Data Preview Section
             st.markdown('<div class="section-title">📋 Data Preview</div>', unsafe_allow_html=True)
-            st.dataframe(fdf.head(20), use_container_width=True)
+            preview = filter_frame(df, group_col, selected, limit=20) if has_groups else df.head(20)
+            st.dataframe(preview, use_container_width=True)
 
 # =====================================================
 # PREDICTIVE MODEL
@@ -1024,22 +1072,77 @@ elif page == "🔮 Predictive Model":
         model_data = load_model()
         model_exists = model_data is not None
         
+        model_meta = load_model_metadata() if model_exists else None
+        trained_backend = (model_meta or {}).get('backend', DEFAULT_ESTIMATOR)
+        
         if model_exists:
-            st.success("✅ Model loaded from aadhaar_model.pkl (using saved model)")
+            st.success(f"✅ Model version {model_data['version'][:8]} loaded from the model registry")
+            load_stats = get_model_load_stats()
+            if load_stats['load_seconds'] is not None:
+                rss = f" · process RSS {load_stats['rss_mb']:.0f} MB" if load_stats.get('rss_mb') else ""
+                st.caption(f"Artifact: {load_stats['format']} ({load_stats.get('artifact_mb', 0):.1f} MB) · loaded in {load_stats['load_seconds'] * 1000:.0f} ms{rss}")
+            training_time = model_meta.get('training_time') if model_meta else None
+            timing = f" · trained in {training_time:.1f}s" if training_time is not None else ""
+            trained_params = model_meta.get('params') if model_meta else None
+            settings_note = f" · {', '.join(f'{k}={v}' for k, v in trained_params.items())}" if trained_params else ""
+            st.caption(f"Backend: {ESTIMATORS.get(trained_backend, {}).get('label', trained_backend)}{settings_note}{timing}")
             stored_r2, stored_mae = get_model_metrics()
             if stored_r2 is not None:
                 st.session_state.model_metrics = (stored_r2, stored_mae)
+            
+            versions = list_versions()
+            if len(versions) > 1:
+                with st.expander(f"🗂 Model Versions ({len(versions)})"):
+                    def version_label(entry):
+                        title = entry.get('name') or ESTIMATORS.get(entry.get('backend'), {}).get('label', entry.get('backend'))
+                        trained = datetime.fromtimestamp(entry['trained_at']).strftime('%Y-%m-%d %H:%M') if entry.get('trained_at') else "unknown date"
+                        r2_note = f" · R² {entry['r2_score']:.3f}" if entry.get('r2_score') is not None else ""
+                        current_note = " (current)" if entry['current'] else ""
+                        return f"{title} · {trained}{r2_note} · {entry['version'][:8]}{current_note}"
+                    
+                    labels = {entry['version']: version_label(entry) for entry in versions}
+                    version_ids = list(labels)
+                    current_index = next((i for i, entry in enumerate(versions) if entry['current']), 0)
+                    chosen = st.selectbox("Version", version_ids, index=current_index, format_func=labels.get)
+                    v1, v2 = st.columns(2)
+                    with v1:
+                        if st.button("✅ Activate Version", use_container_width=True, disabled=versions[current_index]['version'] == chosen):
+                            activate_model(chosen)
+                            st.session_state.pop('predictions', None)
+                            st.rerun()
+                    with v2:
+                        if st.button("↩️ Roll Back", use_container_width=True):
+                            if rollback_model() is None:
+                                st.info("No earlier version to roll back to.")
+                            else:
+                                st.session_state.pop('predictions', None)
+                                st.rerun()
         else:
             st.warning("⚠️ No trained model found. Train a new model below.")
         
+        estimator = st.selectbox(
+            "Training backend",
+            list(ESTIMATORS),
+            index=list(ESTIMATORS).index(trained_backend) if trained_backend in ESTIMATORS else 0,
+            format_func=lambda name: ESTIMATORS[name]['label']
+        )
+        validation = st.radio(
+            "Validation",
+            ["time", "random"],
+            format_func=lambda mode: f"Last {HOLDOUT_MONTHS} months + backtest" if mode == "time" else "Random 20% split",
+            horizontal=True
+        )
+        model_name = st.text_input("Model name (optional)", placeholder="e.g. march-refresh")
+        
         st.markdown('<div class="chart-card">', unsafe_allow_html=True)
         c1, c2, c3, c4 = st.columns(4)
         with c1:
-            st.markdown('<div class="config-box"><div class="config-value">RandomForest</div><div class="config-label">Algorithm</div></div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="config-box"><div class="config-value">{ESTIMATORS[estimator]["label"]}</div><div class="config-label">Algorithm</div></div>', unsafe_allow_html=True)
         with c2:
-            st.markdown('<div class="config-box"><div class="config-value">100</div><div class="config-label">Estimators</div></div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="config-box"><div class="config-value">{ESTIMATORS[estimator]["settings"]}</div><div class="config-label">Settings</div></div>', unsafe_allow_html=True)
         with c3:
-            st.markdown('<div class="config-box"><div class="config-value">20%</div><div class="config-label">Test Split</div></div>', unsafe_allow_html=True)
+            split_label = f"Last {HOLDOUT_MONTHS} months" if validation == "time" else "20% random"
+            st.markdown(f'<div class="config-box"><div class="config-value">{split_label}</div><div class="config-label">Validation</div></div>', unsafe_allow_html=True)
         with c4:
             st.markdown('<div class="config-box"><div class="config-value">total_activity</div><div class="config-label">Target Variable</div></div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
@@ -1051,21 +1154,34 @@ elif page == "🔮 Predictive Model":
         with col1:
             if st.button("🚀 Train Model", use_container_width=True):
                 with st.spinner("Training model with full pipeline..."):
-                    r2, mae = run_model_pipeline(df)
+                    r2, mae = run_model_pipeline(df, estimator=estimator, validation=validation, name=model_name.strip() or None)
                     st.session_state.model_metrics = (r2, mae)
-                    st.success("✅ Model trained and saved!")
+                    st.success("✅ Model trained and published to the registry!")
                     st.rerun()
         
         with col2:
             if model_exists and st.button("📊 Generate Predictions", use_container_width=True):
                 with st.spinner("Generating predictions..."):
                     try:
-                        predictions_df, predictions = make_predictions(df)
-                        st.session_state.predictions_df = predictions_df
+                        predictions, _ = get_cached_predictions(df)
+                        st.session_state.predictions = predictions
                         st.success(f"Generated {len(predictions)} predictions")
                     except Exception as e:
                         st.error(f"Error: {str(e)}")
         
+        with st.expander("🔍 Hyperparameter Search"):
+            st.caption(f"Scores {ESTIMATORS[estimator]['label']} settings on rolling-origin folds in parallel; the best one is trained and saved.")
+            n_iter = st.number_input("Settings to try (0 = full grid)", min_value=0, max_value=50, value=6)
+            if st.button("🔍 Run Search", use_container_width=True):
+                search_progress = st.progress(0.0, text="Evaluating settings...")
+                with st.spinner("Searching..."):
+                    run_search(
+                        df, estimator=estimator, n_iter=n_iter or None, validation=validation,
+                        progress=lambda done, total: search_progress.progress(done / total, text=f"Evaluated {done}/{total} settings")
+                    )
+                st.session_state.model_metrics = get_model_metrics()
+                st.rerun()
+        
         if hasattr(st.session_state, 'model_metrics') and st.session_state.model_metrics[0] is not None:
             r2, mae = st.session_state.model_metrics
             
@@ -1079,6 +1195,30 @@ elif page == "🔮 Predictive Model":
             with c3:
                 st.markdown(f'<div class="demo-card card-3"><div class="demo-icon">✅</div><div class="demo-value">{r2*100:.1f}%</div><div class="demo-label">Variance Explained</div><div class="demo-pct">Model accuracy</div></div>', unsafe_allow_html=True)
             
+            model_validation = (model_meta or {}).get('validation') or {}
+            if model_validation.get('mode') == 'time':
+                refit_note = ", then refit on all months" if model_validation.get('refit_rows') else ""
+                st.caption(f"Scored on the last {model_validation['holdout_months']} months (from {model_validation['holdout_start']}) after training on earlier months{refit_note}")
+            elif model_validation.get('mode') == 'random':
+                st.caption("Scored on a random 20% of rows (optimistic for forecasting)")
+            
+            backtest = (model_meta or {}).get('backtest') or []
+            if backtest:
+                st.markdown('<div class="section-title">🔁 Rolling-Origin Backtest</div>', unsafe_allow_html=True)
+                backtest_df = pd.DataFrame(backtest)[['cutoff', 'train_rows', 'test_rows', 'r2_score', 'mae', 'seconds']]
+                st.dataframe(backtest_df, use_container_width=True, hide_index=True)
+                st.caption(f"Mean backtest R²: {backtest_df['r2_score'].mean():.4f} · MAE: {backtest_df['mae'].mean():.1f}")
+            
+            leaderboard = (model_meta or {}).get('search_leaderboard') or []
+            if leaderboard:
+                st.markdown('<div class="section-title">🏆 Search Leaderboard</div>', unsafe_allow_html=True)
+                leaderboard_df = pd.DataFrame([
+                    {'rank': row['rank'], 'settings': ', '.join(f'{k}={v}' for k, v in row['params'].items()),
+                     'r2_score': row['r2_score'], 'mae': row['mae'], 'cached': row['cached']}
+                    for row in leaderboard
+                ])
+                st.dataframe(leaderboard_df, use_container_width=True, hide_index=True)
+            
             st.markdown("<br>", unsafe_allow_html=True)
             
             quality_text = "The model shows excellent predictive power and can be used reliably." if r2 > 0.8 else "The model shows good predictive power with room for improvement." if r2 > 0.6 else "Consider adding more relevant features to improve accuracy."
@@ -1087,7 +1227,7 @@ elif page == "🔮 Predictive Model":
                 <span class="insight-tag">Model Interpretation</span>
                 <div class="insight-section">
                     <div class="insight-section-title finding">Key Finding</div>
-                    <div class="insight-section-text">The RandomForest model predicts <b>total_activity</b> with {r2*100:.1f}% accuracy using lag features and clustering.</div>
+                    <div class="insight-section-text">The {ESTIMATORS.get(trained_backend, {}).get('label', trained_backend)} model predicts <b>total_activity</b> with {r2*100:.1f}% accuracy using lag features and clustering.</div>
                 </div>
                 <div class="insight-section">
                     <div class="insight-section-title impact">Model Quality</div>
@@ -1100,13 +1240,15 @@ elif page == "🔮 Predictive Model":
             </div>
             ''', unsafe_allow_html=True)
         
-        if hasattr(st.session_state, 'predictions_df') and st.session_state.predictions_df is not None:
+        predictions = st.session_state.get('predictions')
+        if predictions is not None and len(predictions) == len(df):
             st.markdown('<div class="section-title">📋 Prediction Results</div>', unsafe_allow_html=True)
-            predictions_df = st.session_state.predictions_df
-            display_cols = ['state', 'predicted_activity'] if 'state' in predictions_df.columns else ['predicted_activity']
-            if 'total_activity' in predictions_df.columns:
-                display_cols.append('total_activity')
-            st.dataframe(predictions_df[display_cols].head(20), use_container_width=True)
+            # Only the displayed rows are materialised
+            predictions_df = df.head(20)[[c for c in ['state'] if c in df.columns]]
+            predictions_df = predictions_df.assign(predicted_activity=predictions[:20])
+            if 'total_activity' in df.columns:
+                predictions_df['total_activity'] = df['total_activity'].head(20)
+            st.dataframe(predictions_df, use_container_width=True)
 
 # =====================================================
 # INSIGHT CHAT
@@ -1129,6 +1271,19 @@ elif page == "💬 Insight Chat":
         else:
             st.warning("⚠️ Train the model first in 'Predictive Model' page for better insights.")
         
+        llm_status = get_llm_status()
+        if llm_status['source'] == 'llm':
+            breaker_note = " (recovering)" if llm_status['state'] == 'half_open' else ""
+            backend_name = "Gemini" if llm_status['backend'] == 'gemini' else f"the {llm_status['backend']} LLM backend"
+            st.caption(f"🟢 Answers are generated by {backend_name}{breaker_note}")
+        else:
+            retry_in = llm_status.get('retry_in_seconds')
+            retry_note = f", retrying in {retry_in:.0f}s" if retry_in is not None else ""
+            st.caption(f"🟠 Gemini unavailable{retry_note}: answers use built-in templates")
+        queue = get_llm_queue_metrics()
+        if queue['queue_depth']:
+            st.caption(f"⏳ {queue['queue_depth']} Gemini requests queued (avg wait {queue['avg_wait_seconds']:.1f}s)")
+        
         if "auto_insights" not in st.session_state:
             st.session_state.auto_insights = None
         if "auto_suggestions" not in st.session_state:
@@ -1139,14 +1294,23 @@ elif page == "💬 Insight Chat":
         st.markdown('<div class="section-title">📊 Data Insights & Suggestions</div>', unsafe_allow_html=True)
         
         if st.button("🔄 Generate Insights from Data", type="primary", use_container_width=True):
-            with st.spinner("🤖 Analyzing your data with AI..."):
-                try:
-                    insight, suggestions = get_auto_insights(df)
-                    st.session_state.auto_insights = insight
-                    st.session_state.auto_suggestions = suggestions
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Error generating insights: {str(e)}")
+            col1, col2 = st.columns(2)
+            insight_slot = col1.empty()
+            suggestions_slot = col2.empty()
+            try:
+                insight = ""
+                with st.spinner("🤖 Analyzing your data with AI..."):
+                    for kind, text in stream_auto_insights(df):
+                        if kind == "insight":
+                            insight += text
+                            show_insight(insight, insight_slot)
+                        else:
+                            st.session_state.auto_suggestions = text
+                            render_suggestions_card(text, suggestions_slot)
+                st.session_state.auto_insights = insight.strip()
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error generating insights: {str(e)}")
         
         if st.session_state.auto_insights:
             col1, col2 = st.columns(2)
@@ -1164,18 +1328,23 @@ elif page == "💬 Insight Chat":
         
         user_query = st.text_input("Enter your question about Aadhaar data", placeholder="e.g. Which states have the highest predicted activity?", key="chat_input")
         
-        if st.button("🚀 Get Answer", type="primary"):
+        get_answer = st.button("🚀 Get Answer", type="primary")
+        answer_slot = st.empty()
+        
+        if get_answer:
             if user_query.strip():
-                with st.spinner("🤖 Generating response..."):
-                    try:
-                        answer = get_chat_answer(user_query, df)
-                        st.session_state.current_answer = answer
-                        st.session_state.current_question = user_query
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}")
+                try:
+                    answer = ""
+                    render_answer(user_query, "🤖 Generating response...", answer_slot)
+                    for chunk in stream_chat_answer(user_query, df):
+                        answer += chunk
+                        render_answer(user_query, answer, answer_slot)
+                    st.session_state.current_answer = answer.strip()
+                    st.session_state.current_question = user_query
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
             else:
                 st.warning("Please enter a question first.")
         
         if "current_answer" in st.session_state and st.session_state.current_answer:
-            st.markdown(f'<div class="question-box"><div class="q-label">Your Question</div><div class="q-text">{st.session_state.get("current_question", "")}</div></div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="answer-box"><div class="answer-label">💡 Answer</div><div class="answer-text">{st.session_state.current_answer}</div></div>', unsafe_allow_html=True)
+            render_answer(st.session_state.get("current_question", ""), st.session_state.current_answer, answer_slot)
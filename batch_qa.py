@@ -0,0 +1,129 @@
+"""
+Answer a catalogue of questions against one or more dataset extracts and
+stream the results as JSONL.
+
+    python batch_qa.py --questions questions.txt --data extract_*.csv --out answers.jsonl
+
+The data summary and predictions are computed once per dataset, duplicate
+questions are answered once, and LLM calls run concurrently under the shared
+rate limiter (and response cache) in gemini_helper.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from chat_engine import gather_context, is_data_question
+from data_utils import hash_bytes, parse_dataset, register_fingerprint
+from gemini_helper import get_simple_answer, generate_insight_from_data, answer_general_question
+from llm_cache import normalize_prompt
+from llm_scheduler import set_session_id
+
+BATCH_SESSION_ID = "batch"
+
+
+def _answer(question, data_summary, prediction_summary, mode):
+    """Answer one question from precomputed context ("chat" or "insight" style)"""
+    set_session_id(BATCH_SESSION_ID)
+    start = time.perf_counter()
+    try:
+        if mode == "insight":
+            if is_data_question(question):
+                answer = generate_insight_from_data(data_summary, prediction_summary, question)
+            else:
+                answer = answer_general_question(question, data_summary)
+        else:
+            answer = get_simple_answer(data_summary, prediction_summary, question)
+        error = None
+    except Exception as e:
+        answer, error = None, repr(e)
+    return answer, error, time.perf_counter() - start
+
+
+def answer_questions(questions, df, mode="chat", max_workers=8):
+    """
+    Answer every question against df, yielding one result dict per input
+    question as soon as its answer is ready (so not in input order).
+    Questions that only differ in case/whitespace are answered once.
+    """
+    data_summary, prediction_summary = gather_context(df)
+
+    positions = {}
+    for i, question in enumerate(questions):
+        positions.setdefault(normalize_prompt(question), []).append(i)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-qa") as pool:
+        futures = {
+            pool.submit(_answer, questions[indexes[0]], data_summary, prediction_summary, mode): indexes
+            for indexes in positions.values()
+        }
+        for future in as_completed(futures):
+            answer, error, seconds = future.result()
+            for i in futures[future]:
+                yield {
+                    "index": i,
+                    "question": questions[i],
+                    "answer": answer,
+                    "error": error,
+                    "seconds": round(seconds, 3),
+                    "has_predictions": prediction_summary is not None,
+                }
+
+
+def write_jsonl(records, out):
+    """Write records to a text stream as JSON lines, flushing after each one"""
+    count = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+        count += 1
+    return count
+
+
+def load_questions(path):
+    """One question per line; blank lines and lines starting with # are skipped"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def load_extract(path):
+    """Parse a CSV extract, fingerprinting it by file content"""
+    with open(path, "rb") as f:
+        raw_bytes = f.read()
+    df = parse_dataset(raw_bytes)
+    register_fingerprint(df, hash_bytes(raw_bytes))
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", required=True, help="text file with one question per line")
+    parser.add_argument("--data", required=True, nargs="+", help="CSV extract(s) to answer against")
+    parser.add_argument("--out", help="JSONL output file (default: stdout)")
+    parser.add_argument("--mode", choices=["chat", "insight"], default="chat",
+                        help="short chat answers or Finding/Impact/Recommendation insights")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent questions in flight")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for path in args.data:
+            start = time.perf_counter()
+            df = load_extract(path)
+            dataset = os.path.basename(path)
+            records = (
+                {"dataset": dataset, **record}
+                for record in answer_questions(questions, df, mode=args.mode, max_workers=args.workers)
+            )
+            count = write_jsonl(records, out)
+            print(f"{dataset}: {count} answers in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Offline latency/throughput benchmark for the chat pipeline.
+
+Drives get_chat_answer, get_dynamic_suggestions and get_auto_insights against
+the local stub LLM backend with a synthetic question mix and reports
+p50/p95/p99 latency and throughput.
+
+    python benchmark_chat.py --requests 200 --concurrency 8 --latency 0.5 --error-rate 0.05
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import gemini_helper
+from chat_engine import get_chat_answer, get_dynamic_suggestions, get_auto_insights
+from llm_backends import StubBackend
+from llm_cache import ResponseCache
+from llm_scheduler import RequestScheduler, set_session_id
+
+QUESTION_MIX = [
+    # (weight, entry point, question)
+    (4, "chat", "Which state has the highest Aadhaar activity?"),
+    (3, "chat", "What is the age group distribution of enrolments?"),
+    (2, "chat", "How do I link Aadhaar with my bank account?"),
+    (2, "chat", "How can I update my address in Aadhaar?"),
+    (2, "suggestions", "Which districts need more enrolment centres?"),
+    (1, "suggestions", "What trends do you predict for biometric updates?"),
+    (1, "auto_insights", None),
+]
+
+STATES = ["Uttar Pradesh", "Maharashtra", "Bihar", "West Bengal", "Tamil Nadu",
+          "Karnataka", "Gujarat", "Rajasthan", "Kerala", "Assam"]
+
+
+def make_synthetic_dataset(rows, seed=0):
+    """Random dataset with the UIDAI schema"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "date": pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "state": rng.choice(STATES, rows),
+        "district": [f"District {i}" for i in rng.integers(0, 200, rows)],
+        "pincode": rng.integers(110000, 860000, rows).astype(str),
+    })
+    for col in ["age_0_5", "age_5_17", "age_18_greater", "demo_age_5_17",
+                "demo_age_18_greater", "bio_age_5_17", "bio_age_18_greater"]:
+        df[col] = rng.poisson(20, rows)
+    df["total_activity"] = df.filter(like="age").sum(axis=1)
+    return df
+
+
+def run_request(kind, question, df, session_id):
+    set_session_id(session_id)
+    start = time.perf_counter()
+    error = None
+    try:
+        if kind == "chat":
+            get_chat_answer(question, df)
+        elif kind == "suggestions":
+            get_dynamic_suggestions(question, df)
+        else:
+            get_auto_insights(df)
+    except Exception as e:
+        error = repr(e)
+    return kind, time.perf_counter() - start, error
+
+
+def percentiles(latencies):
+    if not latencies:
+        return "n/a"
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return f"p50={p50 * 1000:8.1f}ms  p95={p95 * 1000:8.1f}ms  p99={p99 * 1000:8.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="CSV to use instead of a synthetic dataset")
+    parser.add_argument("--rows", type=int, default=50_000, help="rows in the synthetic dataset")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=4, help="simulated Streamlit sessions")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub response latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=6000, help="client-side rate limit")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="concurrent LLM calls")
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data) if args.data else make_synthetic_dataset(args.rows, args.seed)
+
+    backend = StubBackend(
+        latency=args.latency, jitter=args.jitter, first_token_latency=args.first_token_latency,
+        chunk_delay=args.chunk_delay, error_rate=args.error_rate,
+        quota_error_rate=args.quota_error_rate, seed=args.seed
+    )
+    gemini_helper.set_backend(backend)
+    gemini_helper.set_request_scheduler(RequestScheduler(
+        requests_per_minute=args.rpm, burst=args.max_concurrent, max_concurrent=args.max_concurrent
+    ))
+    if not args.cache:
+        gemini_helper.set_response_cache(ResponseCache(max_entries=0))
+
+    rng = random.Random(args.seed)
+    weights = [w for w, _, _ in QUESTION_MIX]
+    workload = [rng.choices(QUESTION_MIX, weights)[0][1:] for _ in range(args.requests)]
+
+    print(f"Dataset: {len(df):,} rows | {args.requests} requests | concurrency {args.concurrency}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_request, kind, question, df, f"session-{i % args.sessions}")
+            for i, (kind, question) in enumerate(workload)
+        ]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+
+    print(f"\nWall time: {elapsed:.2f}s | throughput: {len(results) / elapsed:.2f} req/s")
+    print(f"{'all':<14} n={len(results):<5} {percentiles([r[1] for r in results])}")
+    for kind in ("chat", "suggestions", "auto_insights"):
+        latencies = [r[1] for r in results if r[0] == kind]
+        print(f"{kind:<14} n={len(latencies):<5} {percentiles(latencies)}")
+
+    errors = [r[2] for r in results if r[2]]
+    print(f"\nRequest errors: {len(errors)}")
+    print(f"Stub backend:   {backend.stats()}")
+    print(f"LLM status:     {gemini_helper.get_llm_status()}")
+    print(f"LLM queue:      {gemini_helper.get_llm_queue_metrics()}")
+    print(f"LLM cache:      {gemini_helper.get_llm_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
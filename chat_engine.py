@@ -2,90 +2,54 @@ from gemini_helper import (
     generate_insight_from_data,
     generate_suggestions_from_insight,
     answer_general_question,
-    get_simple_answer
+    get_simple_answer,
+    stream_simple_answer,
+    stream_insight_from_data
 )
-from model_utils import make_predictions, get_prediction_summary, load_model
+from model_utils import get_cached_predictions, load_model
+from data_utils import summarize_dataset
+from query_classifier import classify_question
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import numpy as np
 
+# Shared pool for overlapping the independent steps of a chat request
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chat")
+
+def get_prediction_context(df):
+    """Return the (cached) prediction summary for df, or None if no model is trained"""
+    if load_model() is None:
+        return None
+    try:
+        _, prediction_summary = get_cached_predictions(df)
+        return prediction_summary
+    except Exception as e:
+        print(f"Prediction error: {e}")
+        return None
+
+def _submit(fn, *args):
+    """Run fn on the shared pool, keeping the caller's LLM session tag"""
+    return _executor.submit(contextvars.copy_context().run, fn, *args)
+
+def gather_context(df):
+    """Compute the data summary and the prediction summary concurrently"""
+    prediction_future = _submit(get_prediction_context, df)
+    data_summary = get_data_summary(df)
+    return data_summary, prediction_future.result()
+
 def get_data_summary(df):
-    """Generate comprehensive data summary for Gemini context"""
-    summary = {}
-    
-    # Basic stats
-    summary['total_rows'] = len(df)
-    
-    if 'total_activity' in df.columns:
-        summary['total_activity'] = int(df['total_activity'].sum())
-        summary['avg_activity'] = float(df['total_activity'].mean())
-        summary['max_activity'] = float(df['total_activity'].max())
-        summary['min_activity'] = float(df['total_activity'].min())
-    
-    # State-wise stats
-    if 'state' in df.columns:
-        state_activity = df.groupby('state')['total_activity'].sum().sort_values(ascending=False)
-        summary['top_5_states'] = state_activity.head(5).to_dict()
-        summary['bottom_5_states'] = state_activity.tail(5).to_dict()
-        summary['total_states'] = df['state'].nunique()
-        summary['highest_state'] = state_activity.idxmax()
-        summary['lowest_state'] = state_activity.idxmin()
-    
-    # District-wise stats
-    if 'district' in df.columns:
-        summary['total_districts'] = df['district'].nunique()
-    
-    # Age group stats
-    age_cols = ['age_0_5', 'age_5_17', 'age_18_greater']
-    age_data = {}
-    for col in age_cols:
-        if col in df.columns:
-            age_data[col] = int(df[col].sum())
-    if age_data:
-        summary['age_groups'] = age_data
-        summary['highest_age_group'] = max(age_data, key=age_data.get)
-    
-    # Demographic vs Biometric
-    demo_cols = ['demo_age_5_17', 'demo_age_18_greater']
-    bio_cols = ['bio_age_5_17', 'bio_age_18_greater']
-    
-    demo_total = sum(df[col].sum() for col in demo_cols if col in df.columns)
-    bio_total = sum(df[col].sum() for col in bio_cols if col in df.columns)
-    
-    if demo_total > 0 or bio_total > 0:
-        summary['demographic_updates'] = int(demo_total)
-        summary['biometric_updates'] = int(bio_total)
-    
-    return summary
+    """Generate comprehensive data summary for Gemini context (computed once per dataset)"""
+    return summarize_dataset(df).to_dict()
 
 def is_data_question(query):
     """Check if the question requires data analysis"""
-    data_keywords = [
-        'state', 'district', 'highest', 'lowest', 'most', 'least',
-        'predict', 'trend', 'activity', 'total', 'average', 'mean',
-        'maximum', 'minimum', 'data', 'statistics', 'stats', 'analysis',
-        'demographic', 'biometric', 'age group', 'region', 'compare',
-        'which', 'how many', 'how much', 'count', 'number'
-    ]
-    q_lower = query.lower()
-    return any(kw in q_lower for kw in data_keywords)
+    return classify_question(query).data_question
 
 def respond_to_query(query, df, model_metrics=None, use_dynamic_insights=True):
     """
     Respond to user queries using Gemini API with data context
     """
-    # Get data summary for context
-    data_summary = get_data_summary(df)
-    
-    # Check if model is available for predictions
-    model_data = load_model()
-    prediction_summary = None
-    
-    if model_data is not None:
-        try:
-            predictions_df, predictions = make_predictions(df)
-            prediction_summary = get_prediction_summary(df, predictions)
-        except Exception as e:
-            print(f"Prediction error: {e}")
-            prediction_summary = None
+    data_summary, prediction_summary = gather_context(df)
     
     # Check if this is a data-specific question or general question
     if is_data_question(query):
@@ -102,19 +66,7 @@ def get_dynamic_suggestions(query, df):
     Get both insights and suggestions dynamically
     Works with or without trained model
     """
-    # Get data summary
-    data_summary = get_data_summary(df)
-    
-    # Try to get predictions if model exists
-    model_data = load_model()
-    prediction_summary = None
-    
-    if model_data is not None:
-        try:
-            predictions_df, predictions = make_predictions(df)
-            prediction_summary = get_prediction_summary(df, predictions)
-        except Exception as e:
-            print(f"Prediction error: {e}")
+    data_summary, prediction_summary = gather_context(df)
     
     # Generate insight based on question type
     if is_data_question(query):
@@ -127,50 +79,60 @@ def get_dynamic_suggestions(query, df):
     
     return insight, suggestions
 
+AUTO_INSIGHT_QUERY = "Provide a comprehensive analysis of the Aadhaar data including state-wise activity, demographic patterns, and key trends."
+
+def stream_auto_insights(df):
+    """
+    Stream the automatic insight and then its suggestions.
+    Yields ("insight", chunk) events followed by one ("suggestions", text) event.
+    Suggestions start generating as soon as the insight's Finding section is
+    complete instead of waiting for the whole insight.
+    """
+    data_summary, prediction_summary = gather_context(df)
+    
+    insight = ""
+    suggestions_future = None
+    for chunk in stream_insight_from_data(data_summary, prediction_summary, AUTO_INSIGHT_QUERY):
+        insight += chunk
+        yield "insight", chunk
+        if suggestions_future is None and "Impact:" in insight:
+            finding = insight.split("Impact:", 1)[0].strip()
+            suggestions_future = _submit(generate_suggestions_from_insight, finding, data_summary)
+    
+    if suggestions_future is None:
+        suggestions = generate_suggestions_from_insight(insight.strip(), data_summary)
+    else:
+        suggestions = suggestions_future.result()
+    yield "suggestions", suggestions
+
 def get_auto_insights(df):
     """
     Generate automatic insights when CSV is uploaded
     Works with or without trained model
     """
-    data_summary = get_data_summary(df)
-    
-    # Try predictions if model exists
-    model_data = load_model()
-    prediction_summary = None
-    
-    if model_data is not None:
-        try:
-            predictions_df, predictions = make_predictions(df)
-            prediction_summary = get_prediction_summary(df, predictions)
-        except:
-            pass
-    
-    # Generate comprehensive insight
-    auto_query = "Provide a comprehensive analysis of the Aadhaar data including state-wise activity, demographic patterns, and key trends."
-    insight = generate_insight_from_data(data_summary, prediction_summary, auto_query)
-    suggestions = generate_suggestions_from_insight(insight, data_summary)
-    
-    return insight, suggestions
+    insight = ""
+    suggestions = ""
+    for kind, text in stream_auto_insights(df):
+        if kind == "insight":
+            insight += text
+        else:
+            suggestions = text
+    
+    return insight.strip(), suggestions
 
 def get_chat_answer(query, df):
     """
     Get a simple, direct answer to a chat question.
     Returns just the answer text (no insights/suggestions format).
     """
-    # Get data summary for context
-    data_summary = get_data_summary(df)
-    
-    # Try to get predictions if model exists
-    model_data = load_model()
-    prediction_summary = None
-    
-    if model_data is not None:
-        try:
-            predictions_df, predictions = make_predictions(df)
-            prediction_summary = get_prediction_summary(df, predictions)
-        except Exception as e:
-            print(f"Prediction error: {e}")
+    data_summary, prediction_summary = gather_context(df)
     
     # Get simple answer
     answer = get_simple_answer(data_summary, prediction_summary, query)
-    return answer
\ No newline at end of file
+    return answer
+
+def stream_chat_answer(query, df):
+    """Streaming version of get_chat_answer: yields answer text chunks"""
+    data_summary, prediction_summary = gather_context(df)
+    
+    yield from stream_simple_answer(data_summary, prediction_summary, query)
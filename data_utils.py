@@ -0,0 +1,620 @@
+import hashlib
+import io
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# pyarrow is optional: without it uploads are simply re-parsed from CSV
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
+# Maximum number of parsed datasets kept in memory across all sessions
+MAX_CACHED_DATASETS = 4
+
+_DATASET_CACHE = OrderedDict()
+_FILE_ID_TO_HASH = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+# Columnar (Arrow IPC) copies of parsed uploads, memory-mapped on later loads
+DATA_CACHE_DIR = ".data_cache"
+
+# Known UIDAI columns and the compact dtypes they are stored with
+COUNTER_COLUMNS = ['age_0_5', 'age_5_17', 'age_18_greater',
+                   'demo_age_5_17', 'demo_age_18_greater',
+                   'bio_age_5_17', 'bio_age_18_greater', 'total_activity']
+CATEGORY_COLUMNS = ['state', 'district', 'pincode']
+EXPECTED_COLUMNS = ['state', 'district', 'pincode', 'date'] + COUNTER_COLUMNS
+
+# Date layouts tried on the first chunk, UIDAI's DD-MM-YYYY first
+DATE_FORMATS = ['%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d']
+
+# Rows per chunk when streaming a CSV upload
+CSV_CHUNK_ROWS = 200_000
+
+# id(df) -> (weakref to df, fingerprint); DataFrames are unhashable so no WeakKeyDictionary
+_FINGERPRINTS = {}
+
+
+def hash_bytes(raw_bytes):
+    """Return a stable content hash for uploaded file bytes"""
+    return hashlib.blake2b(raw_bytes, digest_size=16).hexdigest()
+
+
+def _file_content_hash(uploaded_file):
+    """Hash an uploaded file, reusing the hash for a file_id seen before"""
+    file_id = getattr(uploaded_file, "file_id", None)
+    if file_id is not None:
+        with _CACHE_LOCK:
+            cached = _FILE_ID_TO_HASH.get(file_id)
+        if cached is not None:
+            return cached
+
+    raw_bytes = uploaded_file.getvalue()
+    content_hash = hash_bytes(raw_bytes)
+
+    if file_id is not None:
+        with _CACHE_LOCK:
+            _FILE_ID_TO_HASH[file_id] = content_hash
+            while len(_FILE_ID_TO_HASH) > MAX_CACHED_DATASETS * 4:
+                _FILE_ID_TO_HASH.popitem(last=False)
+    return content_hash
+
+
+def register_fingerprint(df, fingerprint):
+    """Remember the fingerprint of a DataFrame for as long as it is alive"""
+    key = id(df)
+
+    def _forget(ref):
+        # Only drop the entry if it still belongs to the collected frame
+        entry = _FINGERPRINTS.get(key)
+        if entry is not None and entry[0] is ref:
+            _FINGERPRINTS.pop(key, None)
+
+    with _CACHE_LOCK:
+        _FINGERPRINTS[key] = (weakref.ref(df, _forget), fingerprint)
+
+
+def dataset_fingerprint(df):
+    """Return a content fingerprint for df, hashing it only the first time it is seen"""
+    with _CACHE_LOCK:
+        entry = _FINGERPRINTS.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    row_hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    column_names = "|".join(map(str, df.columns)).encode()
+    fingerprint = hash_bytes(row_hashes.tobytes() + column_names)
+    register_fingerprint(df, fingerprint)
+    return fingerprint
+
+
+def detect_date_format(dates):
+    """The first of DATE_FORMATS that parses every non-empty value, or None"""
+    sample = dates.dropna()
+    if sample.empty:
+        return None
+    for date_format in DATE_FORMATS:
+        if pd.to_datetime(sample, format=date_format, errors="coerce").notna().all():
+            return date_format
+    return None
+
+
+def coerce_dtypes(df, date_format=None):
+    """
+    Downcast counters, store location columns as categoricals and parse date
+    once, with date_format if given (otherwise element-wise, day first)
+    """
+    for col in COUNTER_COLUMNS:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            # Already text (read_csv dtype=str); missing values stay missing
+            df[col] = df[col].astype("category")
+    if "date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        if date_format:
+            df["date"] = pd.to_datetime(df["date"], format=date_format, errors="coerce")
+        else:
+            df["date"] = pd.to_datetime(df["date"], format="mixed", dayfirst=True, errors="coerce")
+    return df
+
+
+def validate_schema(df):
+    """Return a list of problems with df against the expected UIDAI schema (empty if none)"""
+    problems = [f"missing column '{col}'" for col in EXPECTED_COLUMNS if col not in df.columns]
+    for col in COUNTER_COLUMNS:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            problems.append(f"column '{col}' is not numeric")
+    return problems
+
+
+def _concat_chunks(chunks):
+    """Concatenate typed chunks one column at a time, releasing chunk memory as it goes"""
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for col in list(chunks[0].columns):
+        parts = [chunk.pop(col) for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            merged = pd.api.types.union_categoricals(parts, sort_categories=True)
+            columns[col] = pd.Series(merged, name=col)
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+        del parts
+    return pd.DataFrame(columns)
+
+
+def parse_dataset(raw_bytes, progress=None, strict=False, chunk_rows=CSV_CHUNK_ROWS, summary=None):
+    """
+    Parse raw CSV bytes into a compactly typed DataFrame, streaming bounded chunks.
+    The schema is checked on the first chunk (strict=True raises ValueError on
+    problems) and progress(fraction) is called after every chunk. When a
+    DataSummary is given, every chunk is folded into it as it is parsed.
+    """
+    buffer = io.BytesIO(raw_bytes)
+    total_bytes = max(len(raw_bytes), 1)
+    chunks = []
+    # Location codes are read as text: inferring per chunk would turn pincode
+    # into float64 in any chunk with a missing value ("110002.0")
+    dtypes = {col: str for col in CATEGORY_COLUMNS}
+    date_format = None
+    for chunk in pd.read_csv(buffer, chunksize=chunk_rows, dtype=dtypes):
+        if not chunks:
+            if strict:
+                problems = validate_schema(chunk)
+                if problems:
+                    raise ValueError("Invalid UIDAI dataset: " + "; ".join(problems))
+            # Fixed once, so every chunk reads the same string as the same date
+            if "date" in chunk.columns:
+                date_format = detect_date_format(chunk["date"])
+        chunk = coerce_dtypes(chunk, date_format)
+        if summary is not None:
+            summary.update(chunk)
+        chunks.append(chunk)
+        if progress:
+            progress(min(buffer.tell() / total_bytes, 1.0))
+
+    if not chunks:
+        df = pd.read_csv(io.BytesIO(raw_bytes), dtype=dtypes)
+        if strict:
+            problems = validate_schema(df)
+            if problems:
+                raise ValueError("Invalid UIDAI dataset: " + "; ".join(problems))
+        if summary is not None:
+            summary.update(df)
+        return df
+    return _concat_chunks(chunks)
+
+
+def _columnar_path(content_hash):
+    return os.path.join(DATA_CACHE_DIR, f"{content_hash}.arrow")
+
+
+def read_columnar_cache(content_hash):
+    """Memory-map a cached dataset, or return None if it is not cached"""
+    path = _columnar_path(content_hash)
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        # The mapping stays alive for as long as the DataFrame references its buffers
+        table = pa_ipc.open_file(pa.memory_map(path, "r")).read_all()
+        return table.to_pandas(split_blocks=True)
+    except Exception as e:
+        print(f"Ignoring unreadable dataset cache {path}: {e}")
+        return None
+
+
+def write_columnar_cache(content_hash, df):
+    """Write df as an uncompressed Arrow IPC file so later loads can memory-map it"""
+    if pa is None:
+        return
+    path = _columnar_path(content_hash)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(DATA_CACHE_DIR, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa_ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not write dataset cache {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_dataset(uploaded_file, progress=None):
+    """
+    Load an uploaded CSV, parsing it only once per unique file content.
+    Parsed uploads are also kept on disk in columnar form and memory-mapped
+    when the same content is uploaded again (e.g. after a restart).
+    Returns (df, content_hash). The same DataFrame object is handed back on
+    every rerun, so callers must treat it as read-only. Raises ValueError,
+    before the rest of the file is read, when the first chunk does not match
+    the UIDAI schema.
+    """
+    content_hash = _file_content_hash(uploaded_file)
+
+    with _CACHE_LOCK:
+        df = _DATASET_CACHE.get(content_hash)
+        if df is not None:
+            _DATASET_CACHE.move_to_end(content_hash)
+            _CACHE_STATS["hits"] += 1
+            return df, content_hash
+        _CACHE_STATS["misses"] += 1
+
+    df = read_columnar_cache(content_hash)
+    if df is None:
+        summary = DataSummary()
+        df = parse_dataset(uploaded_file.getvalue(), progress=progress, strict=True, summary=summary)
+        write_columnar_cache(content_hash, df)
+        _store_summary(content_hash, summary)
+    register_fingerprint(df, content_hash)
+
+    with _CACHE_LOCK:
+        _DATASET_CACHE[content_hash] = df
+        _DATASET_CACHE.move_to_end(content_hash)
+        while len(_DATASET_CACHE) > MAX_CACHED_DATASETS:
+            _DATASET_CACHE.popitem(last=False)
+            _CACHE_STATS["evictions"] += 1
+    return df, content_hash
+
+
+def get_dataset_cache_stats():
+    """Return hit/miss counters and current size of the dataset cache"""
+    with _CACHE_LOCK:
+        stats = dict(_CACHE_STATS)
+        stats["size"] = len(_DATASET_CACHE)
+        stats["max_size"] = MAX_CACHED_DATASETS
+    return stats
+
+
+def clear_dataset_cache():
+    """Drop all cached datasets and reset counters"""
+    with _CACHE_LOCK:
+        _DATASET_CACHE.clear()
+        _FILE_ID_TO_HASH.clear()
+        for key in _CACHE_STATS:
+            _CACHE_STATS[key] = 0
+    with _SUMMARY_LOCK:
+        _SUMMARY_CACHE.clear()
+
+
+# -------------------- AGGREGATION CUBE --------------------
+_CUBE_CACHE = OrderedDict()
+_CUBE_LOCK = threading.Lock()
+
+
+def _numeric_stats(frame, numeric_cols):
+    """sum/count/min/max for every numeric column of frame"""
+    return frame[numeric_cols].agg(["sum", "count", "min", "max"])
+
+
+def build_aggregation_cube(df):
+    """
+    Precompute per-category aggregates of every numeric column for every
+    categorical column. Built once per dataset fingerprint and cached.
+    """
+    fingerprint = dataset_fingerprint(df)
+    with _CUBE_LOCK:
+        cube = _CUBE_CACHE.get(fingerprint)
+        if cube is not None:
+            _CUBE_CACHE.move_to_end(fingerprint)
+            return cube
+
+    numeric_cols = df.select_dtypes(include="number").columns.tolist()
+    categorical_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
+
+    cube = {
+        "numeric_cols": numeric_cols,
+        "categorical_cols": categorical_cols,
+        "record_count": len(df),
+        "overall": _numeric_stats(df, numeric_cols),
+        "groups": {},
+        "group_rows": {},
+    }
+    for col in categorical_cols:
+        grouped = df.groupby(col, observed=True, sort=True)
+        # Columns are a (metric, stat) MultiIndex, rows are the categories
+        cube["groups"][col] = grouped[numeric_cols].agg(["sum", "count", "min", "max"])
+        cube["group_rows"][col] = grouped.size()
+
+    with _CUBE_LOCK:
+        _CUBE_CACHE[fingerprint] = cube
+        while len(_CUBE_CACHE) > MAX_CACHED_DATASETS:
+            _CUBE_CACHE.popitem(last=False)
+    return cube
+
+
+def cube_view(cube, group_col=None, selected=None):
+    """
+    Answer aggregate queries for an optionally filtered view by combining cube cells.
+    Returns {"totals": stats per metric, "groups": per-category stats, "records": rows}.
+    """
+    if not group_col or group_col not in cube["groups"]:
+        return {"totals": cube["overall"], "groups": None, "records": cube["record_count"]}
+
+    groups = cube["groups"][group_col]
+    rows = cube["group_rows"][group_col]
+    if not selected:
+        return {"totals": cube["overall"], "groups": groups, "records": cube["record_count"]}
+
+    groups = groups.loc[groups.index.intersection(selected)]
+    totals = pd.DataFrame({
+        metric: {
+            "sum": groups[(metric, "sum")].sum(),
+            "count": groups[(metric, "count")].sum(),
+            "min": groups[(metric, "min")].min(),
+            "max": groups[(metric, "max")].max(),
+        }
+        for metric in cube["numeric_cols"]
+    })
+    return {"totals": totals, "groups": groups, "records": int(rows.loc[groups.index].sum())}
+
+
+def group_metric(view, metric, stat="sum"):
+    """Per-category series of one statistic from a cube view"""
+    return view["groups"][(metric, stat)]
+
+
+def total_metric(view, metric, stat="sum"):
+    """Single statistic of one metric over a cube view ("mean" is derived from sum/count)"""
+    totals = view["totals"]
+    if stat == "mean":
+        count = totals.at["count", metric]
+        return totals.at["sum", metric] / count if count else 0
+    return totals.at[stat, metric]
+
+
+# -------------------- CATEGORY FILTER INDEX --------------------
+_INDEX_CACHE = OrderedDict()
+_INDEX_LOCK = threading.Lock()
+
+
+def build_category_index(df, col):
+    """
+    Convert a categorical column to integer codes once and precompute the row
+    positions of every category. Cached per (dataset fingerprint, column).
+    """
+    key = (dataset_fingerprint(df), col)
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(key)
+        if index is not None:
+            _INDEX_CACHE.move_to_end(key)
+            return index
+
+    codes, categories = pd.factorize(df[col], sort=True)
+    codes = codes.astype(np.int32)
+    # Stable sort keeps row positions ascending inside each category
+    order = np.argsort(codes, kind="stable").astype(np.int64)
+    counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+    start = int((codes < 0).sum())
+    offsets = np.concatenate(([0], np.cumsum(counts))) + start
+
+    index = {
+        "categories": pd.Index(categories),
+        "codes": codes,
+        "order": order,
+        "offsets": offsets,
+    }
+    with _INDEX_LOCK:
+        _INDEX_CACHE[key] = index
+        while len(_INDEX_CACHE) > MAX_CACHED_DATASETS * 4:
+            _INDEX_CACHE.popitem(last=False)
+    return index
+
+
+def filter_positions(index, selected):
+    """Sorted row positions of the rows whose category is in selected"""
+    wanted = index["categories"].get_indexer(list(selected))
+    wanted = wanted[wanted >= 0]
+    offsets, order = index["offsets"], index["order"]
+    if len(wanted) == 1:
+        code = wanted[0]
+        return order[offsets[code]:offsets[code + 1]]
+    if len(wanted) * 8 < len(index["categories"]):
+        # Few categories: gather their precomputed position runs
+        positions = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in wanted] or [order[:0]])
+        positions.sort()
+        return positions
+    # Many categories: one mask over the small integer codes
+    keep = np.zeros(len(index["categories"]), dtype=bool)
+    keep[wanted] = True
+    codes = index["codes"]
+    return np.flatnonzero(keep[codes] & (codes >= 0))
+
+
+def filter_frame(df, col, selected, limit=None):
+    """
+    Rows of df whose col value is in selected. Returns df itself when nothing is
+    selected and a slice view when the matching rows are contiguous.
+    """
+    if not selected:
+        return df if limit is None else df.iloc[:limit]
+
+    positions = filter_positions(build_category_index(df, col), selected)
+    if limit is not None:
+        positions = positions[:limit]
+    if len(positions) == 0:
+        return df.iloc[:0]
+    if positions[-1] - positions[0] + 1 == len(positions):
+        return df.iloc[positions[0]:positions[-1] + 1]
+    return df.take(positions)
+
+
+# -------------------- DATA SUMMARY --------------------
+_SUMMARY_CACHE = OrderedDict()
+_SUMMARY_LOCK = threading.Lock()
+
+AGE_COLUMNS = ['age_0_5', 'age_5_17', 'age_18_greater']
+DEMO_COLUMNS = ['demo_age_5_17', 'demo_age_18_greater']
+BIO_COLUMNS = ['bio_age_5_17', 'bio_age_18_greater']
+
+
+def _widen(values):
+    """
+    values as int64 (float64 if not integer). Counters are downcast to
+    int8/int16 on parse, so running totals must not keep their dtype.
+    """
+    return values.astype(np.int64 if pd.api.types.is_integer_dtype(values) else np.float64)
+
+
+class DataSummary:
+    """
+    Running aggregates behind the chat context (totals, per-state and
+    per-district activity, distinct states/districts, age/demo/bio sums).
+    Rows can be folded in chunk by chunk with update(), so appending data
+    never requires a full rescan.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.has_activity = False
+        self.activity_sum = 0
+        self.activity_count = 0
+        self.activity_min = None
+        self.activity_max = None
+        self.state_activity = None
+        self.district_activity = None
+        self.states = set()
+        self.districts = set()
+        self.column_sums = {}
+        self._dict = None
+
+    def update(self, chunk):
+        """Fold the rows of chunk into the running aggregates"""
+        self.rows += len(chunk)
+        self._dict = None
+
+        if 'total_activity' in chunk.columns:
+            activity = chunk['total_activity']
+            self.has_activity = True
+            self.activity_sum += _widen(activity).sum()
+            self.activity_count += int(activity.count())
+            if activity.count():
+                low, high = activity.min(), activity.max()
+                self.activity_min = low if self.activity_min is None else min(self.activity_min, low)
+                self.activity_max = high if self.activity_max is None else max(self.activity_max, high)
+
+        if 'state' in chunk.columns:
+            self.states.update(chunk['state'].dropna().unique())
+            if 'total_activity' in chunk.columns:
+                sums = _widen(chunk['total_activity']).groupby(chunk['state'], observed=True).sum()
+                sums.index = sums.index.astype(object)
+                if self.state_activity is None:
+                    self.state_activity = sums
+                else:
+                    self.state_activity = self.state_activity.add(sums, fill_value=0)
+
+        if 'district' in chunk.columns:
+            self.districts.update(chunk['district'].dropna().unique())
+            if 'total_activity' in chunk.columns:
+                sums = _widen(chunk['total_activity']).groupby(chunk['district'], observed=True).sum()
+                sums.index = sums.index.astype(object)
+                if self.district_activity is None:
+                    self.district_activity = sums
+                else:
+                    self.district_activity = self.district_activity.add(sums, fill_value=0)
+
+        for col in AGE_COLUMNS + DEMO_COLUMNS + BIO_COLUMNS:
+            if col in chunk.columns:
+                self.column_sums[col] = self.column_sums.get(col, 0) + _widen(chunk[col]).sum()
+        return self
+
+    def copy(self):
+        other = DataSummary()
+        other.__dict__.update(self.__dict__)
+        other.states = set(self.states)
+        other.districts = set(self.districts)
+        other.column_sums = dict(self.column_sums)
+        return other
+
+    def to_dict(self):
+        """The summary dict used as LLM context (computed once per update)"""
+        if self._dict is not None:
+            return self._dict
+
+        summary = {'total_rows': self.rows}
+
+        if self.has_activity:
+            summary['total_activity'] = int(self.activity_sum)
+            summary['avg_activity'] = float(self.activity_sum / self.activity_count) if self.activity_count else float('nan')
+            summary['max_activity'] = float(self.activity_max) if self.activity_max is not None else float('nan')
+            summary['min_activity'] = float(self.activity_min) if self.activity_min is not None else float('nan')
+
+        if self.state_activity is not None and len(self.state_activity):
+            state_activity = self.state_activity.sort_values(ascending=False)
+            summary['top_5_states'] = state_activity.head(5).to_dict()
+            summary['bottom_5_states'] = state_activity.tail(5).to_dict()
+            summary['total_states'] = len(self.states)
+            summary['highest_state'] = state_activity.idxmax()
+            summary['lowest_state'] = state_activity.idxmin()
+            summary['state_activity'] = state_activity.to_dict()
+
+        if self.districts:
+            summary['total_districts'] = len(self.districts)
+        if self.district_activity is not None and len(self.district_activity):
+            district_activity = self.district_activity.sort_values(ascending=False)
+            summary['top_10_districts'] = district_activity.head(10).to_dict()
+            summary['bottom_5_districts'] = district_activity.tail(5).to_dict()
+
+        age_data = {col: int(self.column_sums[col]) for col in AGE_COLUMNS if col in self.column_sums}
+        if age_data:
+            summary['age_groups'] = age_data
+            summary['highest_age_group'] = max(age_data, key=age_data.get)
+
+        demo_total = sum(self.column_sums.get(col, 0) for col in DEMO_COLUMNS)
+        bio_total = sum(self.column_sums.get(col, 0) for col in BIO_COLUMNS)
+        if demo_total > 0 or bio_total > 0:
+            summary['demographic_updates'] = int(demo_total)
+            summary['biometric_updates'] = int(bio_total)
+
+        self._dict = summary
+        return summary
+
+
+def _store_summary(fingerprint, summary):
+    with _SUMMARY_LOCK:
+        _SUMMARY_CACHE[fingerprint] = summary
+        _SUMMARY_CACHE.move_to_end(fingerprint)
+        while len(_SUMMARY_CACHE) > MAX_CACHED_DATASETS:
+            _SUMMARY_CACHE.popitem(last=False)
+
+
+def summarize_dataset(df):
+    """Return the DataSummary of df, computing it only once per dataset fingerprint"""
+    fingerprint = dataset_fingerprint(df)
+    with _SUMMARY_LOCK:
+        summary = _SUMMARY_CACHE.get(fingerprint)
+        if summary is not None:
+            _SUMMARY_CACHE.move_to_end(fingerprint)
+            return summary
+
+    summary = DataSummary().update(df)
+    _store_summary(fingerprint, summary)
+    return summary
+
+
+def append_rows(df, new_rows):
+    """
+    Append new_rows to df and return the combined frame. Its summary is the
+    cached summary of df updated with new_rows only, not recomputed.
+    """
+    summary = summarize_dataset(df).copy().update(new_rows)
+    combined = pd.concat([df, new_rows], ignore_index=True)
+
+    new_hash = hash_bytes(pd.util.hash_pandas_object(new_rows, index=False).to_numpy().tobytes())
+    fingerprint = hash_bytes(f"{dataset_fingerprint(df)}+{new_hash}".encode())
+    register_fingerprint(combined, fingerprint)
+    _store_summary(fingerprint, summary)
+    return combined
@@ -2,65 +2,138 @@ import os
 import json
 from google.genai import Client
 
+from llm_cache import ResponseCache, make_cache_key
+from llm_resilience import CircuitBreaker, CircuitOpenError, call_with_retries, stream_with_timeout
+from llm_scheduler import RequestScheduler
+from llm_backends import GeminiBackend, stub_backend_from_env
+from query_classifier import classify_question, any_keyword, INSIGHT_AGE_KEYWORDS, INSIGHT_UPDATE_KEYWORDS
+
 # Try to create client, but handle if API key is missing or quota exceeded
 try:
     client = Client(api_key=os.getenv("GEMINI_API_KEY"))
 except:
     client = None
 
-# Flag to track if API is working
-API_AVAILABLE = True
+# LLM_BACKEND=stub swaps in a local stand-in (no network) for load tests and demos
+if os.getenv("LLM_BACKEND", "gemini").lower() == "stub":
+    _backend = stub_backend_from_env()
+else:
+    _backend = GeminiBackend(client) if client else None
+
+MODEL_NAME = "gemini-2.0-flash"
+
+# Responses keyed on model + normalized prompt; set GEMINI_CACHE_PATH to persist them
+_response_cache = ResponseCache(
+    max_entries=int(os.getenv("GEMINI_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.getenv("GEMINI_CACHE_TTL", "3600")),
+    path=os.getenv("GEMINI_CACHE_PATH")
+)
+
+# Failing calls open the breaker for a while instead of disabling the API for good
+LLM_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT", "20"))
+LLM_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("GEMINI_BREAKER_FAILURES", "3")),
+    recovery_timeout=float(os.getenv("GEMINI_BREAKER_RECOVERY", "30"))
+)
+
+# Upper bound on the data context added to each prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("GEMINI_CONTEXT_TOKENS", "350"))
+
+# The client is shared by every session in the process: rate-limit and bound concurrent calls
+_scheduler = RequestScheduler(
+    requests_per_minute=float(os.getenv("GEMINI_RPM", "60")),
+    burst=int(os.getenv("GEMINI_BURST", "10")),
+    max_concurrent=int(os.getenv("GEMINI_MAX_CONCURRENT", "4"))
+)
+
+def _generate(prompt: str, model: str = MODEL_NAME) -> str:
+    """
+    Call generate_content, serving repeated prompts from the response cache.
+    Raises CircuitOpenError while the breaker is open.
+    """
+    cached = _response_cache.get(model, prompt)
+    if cached is not None:
+        return cached
+    
+    backend = _backend
+    
+    def call():
+        return backend.generate(model, prompt)
+    
+    def request():
+        text = call_with_retries(
+            call,
+            breaker=_breaker,
+            retries=LLM_MAX_RETRIES,
+            timeout=LLM_TIMEOUT_SECONDS,
+            limiter=_scheduler
+        ).strip()
+        _response_cache.set(model, prompt, text)
+        return text
+    
+    # Sessions asking the same thing at the same time share one call
+    return _scheduler.coalesce(make_cache_key(model, prompt), request)
+
+def _try_generate(prompt: str):
+    """Return the LLM answer, or None when the caller should use its fallback"""
+    if _backend is None:
+        return None
+    try:
+        return _generate(prompt)
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        print(f"Gemini API error: {e}")
+        return None
+
+def set_backend(backend):
+    """Replace the LLM backend (None forces the template fallbacks)"""
+    global _backend
+    _backend = backend
+
+def get_backend():
+    return _backend
+
+def set_response_cache(cache):
+    """Replace the response cache, e.g. ResponseCache(max_entries=0) to disable caching"""
+    global _response_cache
+    _response_cache = cache
+
+def set_request_scheduler(scheduler):
+    """Replace the request scheduler (rate limit and concurrency bound)"""
+    global _scheduler
+    _scheduler = scheduler
+
+def get_llm_queue_metrics() -> dict:
+    """Queue depth and wait times of the shared Gemini request scheduler"""
+    return _scheduler.metrics()
+
+def get_llm_status() -> dict:
+    """Breaker state for the UI: whether answers currently come from the LLM or the fallback"""
+    status = _breaker.snapshot()
+    status['backend'] = _backend.name if _backend is not None else None
+    status['source'] = 'llm' if _backend is not None and status['state'] != CircuitBreaker.OPEN else 'fallback'
+    return status
+
+def get_llm_cache_stats() -> dict:
+    """Return hit/miss statistics of the LLM response cache"""
+    return _response_cache.stats()
 
 def is_aadhaar_related(question: str) -> bool:
     """Check if question is related to Aadhaar/UIDAI only"""
-    aadhaar_keywords = [
-        "aadhaar", "aadhar", "uidai", "enrol", "enrollment", "update",
-        "demographic", "biometric", "state", "district", "activity",
-        "trend", "predict", "forecast", "age", "child", "adult",
-        "bank", "link", "mobile", "address", "document", "card",
-        "pan", "verification", "authentication", "otp", "maadhaar",
-        "e-aadhaar", "pvc", "center", "centre", "seva kendra"
-    ]
-    
-    # Non-Aadhaar keywords that should be rejected
-    non_aadhaar = [
-        "ice cream", "movie", "game", "sport", "music", "food",
-        "recipe", "weather", "cricket", "football", "python",
-        "java", "programming", "coding", "machine learning", "ai",
-        "artificial intelligence", "deep learning", "neural"
-    ]
-    
-    q_lower = question.lower()
-    
-    # Reject if contains non-Aadhaar topics
-    for term in non_aadhaar:
-        if term in q_lower and "aadhaar" not in q_lower and "aadhar" not in q_lower:
-            return False
-    
-    # Accept if contains Aadhaar keywords
-    return any(kw in q_lower for kw in aadhaar_keywords)
+    return classify_question(question).aadhaar_related
 
 def get_rejection_response():
     """Return rejection message for non-Aadhaar questions"""
     return "❌ This question is not related to Aadhaar or UIDAI services. Please ask questions about Aadhaar enrollment, updates, state-wise trends, linking Aadhaar to bank/mobile, or UIDAI policies."
 
-def get_simple_answer(data_summary: dict, prediction_summary: dict = None, question: str = "") -> str:
-    """
-    Generate a simple, direct answer for chat questions.
-    """
-    global API_AVAILABLE
-    
-    # Check if question is Aadhaar related
-    if question and not is_aadhaar_related(question):
-        return get_rejection_response()
+def build_simple_answer_prompt(data_summary: dict, prediction_summary: dict = None, question: str = "") -> str:
+    """Prompt for a direct chat answer"""
+    context_parts = build_context(data_summary, prediction_summary, question)
+    context = "\n".join(context_parts)
     
-    # Try Gemini API first if available
-    if API_AVAILABLE and client:
-        try:
-            context_parts = build_context(data_summary, prediction_summary, question)
-            context = "\n".join(context_parts)
-            
-            prompt = f"""
+    prompt = f"""
 You are an Aadhaar expert assistant for UIDAI.
 
 {context}
@@ -73,24 +146,141 @@ Provide a clear, concise, and direct answer to the question. Use the data provid
 - Do not use Finding/Impact/Recommendation format
 - Just give a straightforward answer
 """
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            return response.text.strip()
+    return prompt
+
+def build_insight_prompt(data_summary: dict, prediction_summary: dict = None, question: str = "") -> str:
+    """Prompt for a Finding/Impact/Recommendation insight"""
+    context_parts = build_context(data_summary, prediction_summary, question)
+    context = "\n".join(context_parts)
+    
+    prompt = f"""
+You are a senior policy analyst for UIDAI (Unique Identification Authority of India).
+
+Analyze the following Aadhaar data and provide actionable insights.
+
+{context}
+
+Answer the user's question if provided, using the data above.
+
+Provide your response using EXACTLY this format:
+
+Finding:
+[Clear, data-driven statement about what the analysis reveals. Include specific numbers from the data.]
+
+Impact:
+[Explain the operational, policy, or strategic implications of these findings]
+
+Recommendation:
+[Specific, actionable recommendations for UIDAI based on the data]
+
+Be specific and use actual numbers from the data provided.
+"""
+    return prompt
+
+def _generate_stream(prompt: str, model: str = MODEL_NAME):
+    """
+    Yield response text chunks as the model produces them. Cached prompts yield
+    the whole answer at once. Raises CircuitOpenError while the breaker is open.
+    """
+    cached = _response_cache.get(model, prompt)
+    if cached is not None:
+        yield cached
+        return
+    
+    if not _breaker.allow_request():
+        raise CircuitOpenError("LLM circuit breaker is open")
+    
+    # A stream cannot be retried once tokens have been shown, so failures only feed the breaker
+    backend = _backend
+    parts = []
+    finished = False
+    try:
+        for text in stream_with_timeout(lambda: backend.stream(model, prompt), LLM_TIMEOUT_SECONDS, limiter=_scheduler):
+            parts.append(text)
+            yield text
+        finished = True
+    except Exception as e:
+        finished = True
+        _breaker.record_failure(e)
+        raise
+    finally:
+        if not finished:
+            # Abandoned by the consumer (rerun or closed generator): tokens
+            # arriving means the backend is up; otherwise free the probe slot
+            if parts:
+                _breaker.record_success()
+            else:
+                _breaker.release_probe()
+    _breaker.record_success()
+    _response_cache.set(model, prompt, "".join(parts).strip())
+
+def _stream_or_fallback(prompt: str, fallback):
+    """Stream the LLM answer, switching to fallback() if the call fails before any output"""
+    started = False
+    if _backend is not None:
+        try:
+            for text in _generate_stream(prompt):
+                started = True
+                yield text
+            return
+        except CircuitOpenError:
+            pass
         except Exception as e:
             print(f"Gemini API error: {e}")
-            API_AVAILABLE = False
+    
+    if started:
+        yield "\n\n_(Response interrupted. Please try again.)_"
+    else:
+        yield fallback()
+
+def stream_simple_answer(data_summary: dict, prediction_summary: dict = None, question: str = ""):
+    """Streaming version of get_simple_answer: yields text chunks"""
+    if question and not is_aadhaar_related(question):
+        yield get_rejection_response()
+        return
+    
+    prompt = build_simple_answer_prompt(data_summary, prediction_summary, question)
+    yield from _stream_or_fallback(
+        prompt,
+        lambda: generate_simple_answer_fallback(data_summary, prediction_summary, question)
+    )
+
+def stream_insight_from_data(data_summary: dict, prediction_summary: dict = None, question: str = ""):
+    """Streaming version of generate_insight_from_data: yields text chunks"""
+    if question and not is_aadhaar_related(question):
+        yield get_rejection_response()
+        return
+    
+    prompt = build_insight_prompt(data_summary, prediction_summary, question)
+    yield from _stream_or_fallback(
+        prompt,
+        lambda: generate_data_insight_fallback(data_summary, prediction_summary, question)
+    )
+
+def get_simple_answer(data_summary: dict, prediction_summary: dict = None, question: str = "") -> str:
+    """
+    Generate a simple, direct answer for chat questions.
+    """
+    # Check if question is Aadhaar related
+    if question and not is_aadhaar_related(question):
+        return get_rejection_response()
+    
+    # Try Gemini API first if available
+    if _backend is not None:
+        prompt = build_simple_answer_prompt(data_summary, prediction_summary, question)
+        answer = _try_generate(prompt)
+        if answer is not None:
+            return answer
     
     # Fallback: Generate simple answer from data
     return generate_simple_answer_fallback(data_summary, prediction_summary, question)
 
 def generate_simple_answer_fallback(data_summary: dict, prediction_summary: dict = None, question: str = "") -> str:
     """Generate simple answer without API"""
-    q_lower = question.lower() if question else ""
+    topics = classify_question(question)
     
     # State-related questions
-    if any(kw in q_lower for kw in ['state', 'highest', 'lowest', 'most', 'least']):
+    if topics.state:
         highest = data_summary.get('highest_state', 'N/A')
         lowest = data_summary.get('lowest_state', 'N/A')
         top_states = data_summary.get('top_5_states', {})
@@ -101,7 +291,7 @@ def generate_simple_answer_fallback(data_summary: dict, prediction_summary: dict
         return f"**Highest activity:** {highest}\n**Lowest activity:** {lowest}"
     
     # Age-related questions
-    if any(kw in q_lower for kw in ['age', 'child', 'adult', 'demographic', 'young']):
+    if topics.age:
         age_data = data_summary.get('age_groups', {})
         if age_data:
             age_info = "\n".join([f"- **{k.replace('_', '-')}**: {v:,}" for k, v in age_data.items()])
@@ -109,7 +299,7 @@ def generate_simple_answer_fallback(data_summary: dict, prediction_summary: dict
         return "Age group data not available in the current dataset."
     
     # Bank/Link questions
-    if any(kw in q_lower for kw in ['bank', 'link', 'connect', 'mobile', 'pan']):
+    if topics.bank_link:
         return """🔗 **How to Link Aadhaar:**
 
 - **Bank:** Visit branch with Aadhaar OR use net banking
@@ -119,7 +309,7 @@ def generate_simple_answer_fallback(data_summary: dict, prediction_summary: dict
 Always use official UIDAI channels: **uidai.gov.in** or **1947** helpline"""
     
     # Update questions
-    if any(kw in q_lower for kw in ['update', 'change', 'correction']):
+    if topics.update:
         return """📝 **Aadhaar Update Options:**
 
 - **Online:** myaadhaar.uidai.gov.in (address, mobile, email)
@@ -145,95 +335,136 @@ def generate_insight_from_data(data_summary: dict, prediction_summary: dict = No
     Generate insights from data statistics.
     Uses Gemini API if available, otherwise uses template-based responses.
     """
-    global API_AVAILABLE
-    
     # Check if question is Aadhaar related
     if question and not is_aadhaar_related(question):
         return get_rejection_response()
     
     # Try Gemini API first if available
-    if API_AVAILABLE and client:
-        try:
-            context_parts = build_context(data_summary, prediction_summary, question)
-            context = "\n".join(context_parts)
-            
-            prompt = f"""
-You are a senior policy analyst for UIDAI (Unique Identification Authority of India).
+    if _backend is not None:
+        prompt = build_insight_prompt(data_summary, prediction_summary, question)
+        answer = _try_generate(prompt)
+        if answer is not None:
+            return answer
+    
+    # Fallback: Generate response from data without API
+    return generate_data_insight_fallback(data_summary, prediction_summary, question)
 
-Analyze the following Aadhaar data and provide actionable insights.
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English/numbers)"""
+    return len(text) // 4 + 1
 
-{context}
+def _ranked_lines(title, values, fmt="{:,.0f}"):
+    return [f"\n{title}:"] + [f"  - {name}: {fmt.format(value)}" for name, value in values.items()]
 
-Answer the user's question if provided, using the data above.
+def _age_lines(age_groups):
+    lines = ["\nAge Group Distribution:"]
+    for age, count in age_groups.items():
+        lines.append(f"  - {age.replace('_', '-').replace('age-', '')}: {count:,}")
+    return lines
 
-Provide your response using EXACTLY this format:
-
-Finding:
-[Clear, data-driven statement about what the analysis reveals. Include specific numbers from the data.]
-
-Impact:
-[Explain the operational, policy, or strategic implications of these findings]
-
-Recommendation:
-[Specific, actionable recommendations for UIDAI based on the data]
+def _mentioned_states(question, data_summary):
+    """States from the data that the question names explicitly"""
+    q_lower = question.lower()
+    return [state for state in data_summary.get('state_activity', {}) if str(state).lower() in q_lower]
 
-Be specific and use actual numbers from the data provided.
-"""
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            return response.text.strip()
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            API_AVAILABLE = False  # Disable for future calls
+def _context_sections(data_summary, prediction_summary, question):
+    """Context sections relevant to the question, most important first"""
+    topics = classify_question(question)
+    by_state = (prediction_summary or {}).get('by_state', {})
+    sections = []
     
-    # Fallback: Generate response from data without API
-    return generate_data_insight_fallback(data_summary, prediction_summary, question)
-
-def build_context(data_summary, prediction_summary, question):
-    """Build context string from data"""
+    overview = ["=== ACTUAL DATA STATISTICS ===", f"Total Records: {data_summary.get('total_rows', 0):,}"]
+    if 'total_activity' in data_summary:
+        overview.append(f"Total Aadhaar Activity: {data_summary.get('total_activity', 0):,}")
+        overview.append(f"Average Activity per Record: {data_summary.get('avg_activity', 0):,.1f}")
+    sections.append(overview)
+    
+    states = _mentioned_states(question, data_summary) if question else []
+    if states:
+        lines = ["\nStates Asked About:"]
+        for state in states:
+            line = f"  - {state}: {data_summary['state_activity'][state]:,.0f} activity"
+            if state in by_state.get('sum', {}):
+                line += f", {by_state['sum'][state]:,.0f} predicted"
+            lines.append(line)
+        sections.append(lines)
+    
+    if topics.forecast and prediction_summary:
+        lines = ["\n=== MODEL PREDICTIONS ===",
+                 f"Total Predicted Activity: {prediction_summary.get('total_predicted', 0):,.0f}",
+                 f"Average Predicted per Record: {prediction_summary.get('mean_predicted', 0):,.1f}"]
+        if by_state.get('sum'):
+            ranked = sorted(by_state['sum'].items(), key=lambda item: item[1], reverse=True)
+            lines += _ranked_lines("Top 5 States by Predicted Activity", dict(ranked[:5]))
+            lines += _ranked_lines("Bottom 3 States by Predicted Activity", dict(ranked[-3:]))
+        sections.append(lines)
+    
+    if topics.district:
+        lines = [f"\nTotal Districts: {data_summary.get('total_districts', 0)}"]
+        if 'top_10_districts' in data_summary:
+            lines += _ranked_lines("Top 10 Districts by Activity", data_summary['top_10_districts'])
+            lines += _ranked_lines("Bottom 5 Districts by Activity", data_summary['bottom_5_districts'])
+        sections.append(lines)
+    
+    if topics.age and 'age_groups' in data_summary:
+        sections.append(_age_lines(data_summary['age_groups']))
+    
+    if topics.update and 'demographic_updates' in data_summary:
+        sections.append(["\nUpdates:",
+                         f"  - Demographic updates: {data_summary['demographic_updates']:,}",
+                         f"  - Biometric updates: {data_summary['biometric_updates']:,}"])
+    
+    specific = states or topics.state or topics.forecast or topics.district or topics.age or topics.update
+    if 'highest_state' in data_summary and (topics.state or not specific):
+        lines = [f"\nHighest Activity State: {data_summary.get('highest_state')}",
+                 f"Lowest Activity State: {data_summary.get('lowest_state')}",
+                 f"Total States: {data_summary.get('total_states', 0)}"]
+        if 'top_5_states' in data_summary:
+            lines += _ranked_lines("Top 5 States by Activity", data_summary['top_5_states'])
+        if topics.state and 'bottom_5_states' in data_summary:
+            lines += _ranked_lines("Bottom 5 States by Activity", data_summary['bottom_5_states'])
+        sections.append(lines)
+    
+    # No specific intent: the general overview the prompt always used to carry
+    if not specific:
+        if 'age_groups' in data_summary:
+            sections.append(_age_lines(data_summary['age_groups']))
+        if prediction_summary:
+            sections.append(["\n=== MODEL PREDICTIONS ===",
+                             f"Total Predicted Activity: {prediction_summary.get('total_predicted', 0):,.0f}"])
+    return sections
+
+def build_context(data_summary, prediction_summary, question, max_tokens=None):
+    """
+    Build context lines from the slices of the summary relevant to the question.
+    Sections are added in order of relevance while they fit in max_tokens
+    (default CONTEXT_TOKEN_BUDGET); sections that do not fit are left out.
+    """
+    if max_tokens is None:
+        max_tokens = CONTEXT_TOKEN_BUDGET
     context_parts = []
     
     if question:
         context_parts.append(f"User Question: {question}\n")
+    used = sum(estimate_tokens(part) for part in context_parts)
     
-    context_parts.append("=== ACTUAL DATA STATISTICS ===")
-    context_parts.append(f"Total Records: {data_summary.get('total_rows', 0):,}")
-    
-    if 'total_activity' in data_summary:
-        context_parts.append(f"Total Aadhaar Activity: {data_summary.get('total_activity', 0):,}")
-        context_parts.append(f"Average Activity per Record: {data_summary.get('avg_activity', 0):,.1f}")
-    
-    if 'highest_state' in data_summary:
-        context_parts.append(f"\nHighest Activity State: {data_summary.get('highest_state')}")
-        context_parts.append(f"Lowest Activity State: {data_summary.get('lowest_state')}")
-        context_parts.append(f"Total States: {data_summary.get('total_states', 0)}")
-    
-    if 'top_5_states' in data_summary:
-        context_parts.append("\nTop 5 States by Activity:")
-        for state, activity in data_summary['top_5_states'].items():
-            context_parts.append(f"  - {state}: {activity:,.0f}")
-    
-    if 'age_groups' in data_summary:
-        context_parts.append("\nAge Group Distribution:")
-        for age, count in data_summary['age_groups'].items():
-            age_label = age.replace('_', '-').replace('age-', '')
-            context_parts.append(f"  - {age_label}: {count:,}")
-    
-    if prediction_summary:
-        context_parts.append("\n=== MODEL PREDICTIONS ===")
-        context_parts.append(f"Total Predicted Activity: {prediction_summary.get('total_predicted', 0):,.0f}")
+    for i, section in enumerate(_context_sections(data_summary, prediction_summary, question)):
+        cost = estimate_tokens("\n".join(section))
+        # The overview is always kept; later sections only if they fit
+        if i and used + cost > max_tokens:
+            continue
+        context_parts.extend(section)
+        used += cost
     
     return context_parts
 
 def generate_data_insight_fallback(data_summary: dict, prediction_summary: dict = None, question: str = "") -> str:
     """Generate insight without API using data templates"""
     
-    q_lower = question.lower() if question else ""
+    topics = classify_question(question)
     
     # State-related questions
-    if any(kw in q_lower for kw in ['state', 'highest', 'lowest', 'most', 'least']):
+    if topics.state:
         highest = data_summary.get('highest_state', 'N/A')
         lowest = data_summary.get('lowest_state', 'N/A')
         total_states = data_summary.get('total_states', 0)
@@ -254,7 +485,7 @@ Allocate additional resources to {highest} and other high-demand states. Investi
 """.strip()
     
     # Age-related questions
-    if any(kw in q_lower for kw in ['age', 'child', 'adult', 'demographic', '18', 'young']):
+    if any_keyword(topics.matched, INSIGHT_AGE_KEYWORDS):
         age_data = data_summary.get('age_groups', {})
         if age_data:
             highest_age = max(age_data, key=age_data.get) if age_data else 'N/A'
@@ -271,7 +502,7 @@ Ensure adequate child-friendly enrollment facilities if 0-5 dominates, or stream
 """.strip()
     
     # Bank/Link questions
-    if any(kw in q_lower for kw in ['bank', 'link', 'connect', 'mobile', 'pan']):
+    if topics.bank_link:
         return """
 Finding:
 Aadhaar can be linked to bank accounts, mobile numbers, and PAN through multiple official channels.
@@ -288,7 +519,7 @@ Always use official UIDAI channels (uidai.gov.in) for security.
 """.strip()
     
     # Update questions
-    if any(kw in q_lower for kw in ['update', 'change', 'correction', 'address', 'name', 'photo']):
+    if any_keyword(topics.matched, INSIGHT_UPDATE_KEYWORDS):
         return """
 Finding:
 Aadhaar updates can be done for demographic data (name, address, DOB) and biometric data (fingerprints, iris, photo).
@@ -321,16 +552,13 @@ Focus operational resources on high-activity regions like {highest}. Monitor tre
 
 def answer_general_question(question: str, data_summary: dict = None) -> str:
     """Answer general Aadhaar-related questions"""
-    global API_AVAILABLE
-    
     # Check if Aadhaar related
     if not is_aadhaar_related(question):
         return get_rejection_response()
     
     # Try API first
-    if API_AVAILABLE and client:
-        try:
-            prompt = f"""
+    if _backend is not None:
+        prompt = f"""
 You are an Aadhaar expert assistant for UIDAI.
 
 User Question: {question}
@@ -346,25 +574,18 @@ Impact:
 Recommendation:
 [Practical next steps]
 """
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            return response.text.strip()
-        except:
-            API_AVAILABLE = False
+        answer = _try_generate(prompt)
+        if answer is not None:
+            return answer
     
     # Fallback for common questions
     return generate_data_insight_fallback(data_summary or {}, None, question)
 
 def generate_suggestions_from_insight(insight: str, data_summary: dict = None) -> str:
     """Generate suggestions based on insights"""
-    global API_AVAILABLE
-    
     # Try API first
-    if API_AVAILABLE and client:
-        try:
-            prompt = f"""
+    if _backend is not None:
+        prompt = f"""
 Based on this insight, provide 3-5 actionable suggestions:
 
 {insight}
@@ -375,13 +596,9 @@ Suggestions:
 2. [Action 2]
 ...
 """
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            return response.text.strip()
-        except:
-            API_AVAILABLE = False
+        answer = _try_generate(prompt)
+        if answer is not None:
+            return answer
     
     # Fallback suggestions based on data
     highest = data_summary.get('highest_state', 'high-activity states') if data_summary else 'high-activity states'
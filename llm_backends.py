@@ -0,0 +1,125 @@
+import os
+import random
+import threading
+import time
+
+
+class LLMBackend:
+    """Interface gemini_helper talks to: a blocking call and a streaming call"""
+
+    name = "base"
+
+    def generate(self, model, prompt):
+        """Return the full response text"""
+        raise NotImplementedError
+
+    def stream(self, model, prompt):
+        """Yield response text chunks (default: the whole response at once)"""
+        yield self.generate(model, prompt)
+
+
+class GeminiBackend(LLMBackend):
+    """The real Gemini API through google.genai"""
+
+    name = "gemini"
+
+    def __init__(self, client):
+        self.client = client
+
+    def generate(self, model, prompt):
+        return self.client.models.generate_content(model=model, contents=prompt).text
+
+    def stream(self, model, prompt):
+        for chunk in self.client.models.generate_content_stream(model=model, contents=prompt):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubLLMError(Exception):
+    """Error raised by StubBackend; `code` mimics the HTTP status of the real API"""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+class StubBackend(LLMBackend):
+    """
+    Local stand-in for Gemini with configurable latency, streaming speed, error
+    rate and quota (429) error rate. Responses follow the format the prompt asks
+    for, so the UI and parsers behave as they do with the real model.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.8, jitter=0.3, first_token_latency=0.3, chunk_delay=0.03,
+                 chunk_size=24, error_rate=0.0, quota_error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.first_token_latency = first_token_latency
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "errors": 0, "quota_errors": 0}
+
+    def _roll(self):
+        with self._lock:
+            self._stats["calls"] += 1
+            roll = self._random.random()
+            delay = max(0.0, self._random.gauss(0, self.jitter)) if self.jitter else 0.0
+            if roll < self.quota_error_rate:
+                self._stats["quota_errors"] += 1
+                return delay, StubLLMError("429 RESOURCE_EXHAUSTED: stub quota exceeded", 429)
+            if roll < self.quota_error_rate + self.error_rate:
+                self._stats["errors"] += 1
+                return delay, StubLLMError("503 UNAVAILABLE: stub backend error", 503)
+        return delay, None
+
+    def _respond(self, prompt):
+        if "Suggestions:" in prompt:
+            return ("Suggestions:\n"
+                    "1. Add enrolment capacity in the highest-activity states\n"
+                    "2. Run awareness drives in the lowest-activity states\n"
+                    "3. Deploy mobile enrolment units to underserved districts")
+        if "Finding:" in prompt:
+            return ("Finding:\nActivity is concentrated in a few states (stub response).\n\n"
+                    "Impact:\nHigh-demand centres face longer queues.\n\n"
+                    "Recommendation:\nRebalance staff and centres towards high-demand states.")
+        return "This is a stub answer based on the provided Aadhaar data statistics."
+
+    def generate(self, model, prompt):
+        delay, error = self._roll()
+        time.sleep(self.latency + delay)
+        if error is not None:
+            raise error
+        return self._respond(prompt)
+
+    def stream(self, model, prompt):
+        delay, error = self._roll()
+        time.sleep(self.first_token_latency + delay)
+        if error is not None:
+            raise error
+        text = self._respond(prompt)
+        for start in range(0, len(text), self.chunk_size):
+            if start:
+                time.sleep(self.chunk_delay)
+            yield text[start:start + self.chunk_size]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+def stub_backend_from_env():
+    """StubBackend configured through LLM_STUB_* environment variables"""
+    return StubBackend(
+        latency=float(os.getenv("LLM_STUB_LATENCY", "0.8")),
+        jitter=float(os.getenv("LLM_STUB_JITTER", "0.3")),
+        first_token_latency=float(os.getenv("LLM_STUB_FIRST_TOKEN_LATENCY", "0.3")),
+        chunk_delay=float(os.getenv("LLM_STUB_CHUNK_DELAY", "0.03")),
+        error_rate=float(os.getenv("LLM_STUB_ERROR_RATE", "0")),
+        quota_error_rate=float(os.getenv("LLM_STUB_QUOTA_ERROR_RATE", "0"))
+    )
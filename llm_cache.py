@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace and case so trivially different prompts share a key"""
+    return " ".join(prompt.split()).casefold()
+
+
+def make_cache_key(model, prompt):
+    """Cache key for a (model, prompt) pair"""
+    raw = f"{model}\n{normalize_prompt(prompt)}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of LLM responses keyed on model name and normalized prompt.
+    When path is given, entries are also persisted to a local SQLite file so
+    they survive restarts.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=3600, path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._db = None
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(key TEXT PRIMARY KEY, response TEXT, created REAL)"
+                )
+                if ttl_seconds is not None:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE created < ?", (time.time() - ttl_seconds,)
+                    )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"LLM cache persistence disabled: {e}")
+                self._db = None
+
+    def _is_fresh(self, created):
+        return self.ttl_seconds is None or time.time() - created < self.ttl_seconds
+
+    def _load_persisted(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT response, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        return row
+
+    def get(self, model, prompt):
+        """Return the cached response or None"""
+        key = make_cache_key(model, prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load_persisted(key)
+            if entry is not None:
+                response, created = entry
+                if self._is_fresh(created):
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return response
+                self._stats["expired"] += 1
+                self._entries.pop(key, None)
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, model, prompt, response):
+        """Store a response"""
+        key = make_cache_key(model, prompt)
+        entry = (response, time.time())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)",
+                        (key, response, entry[1]),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"LLM cache write failed: {e}")
+
+    def clear(self):
+        """Drop all entries (including persisted ones) and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["persistent"] = self._db is not None
+        return stats
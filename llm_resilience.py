@@ -0,0 +1,223 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit breaker is open"""
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call does not finish within its timeout"""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures. After
+    `recovery_timeout` seconds the breaker goes half-open and lets up to
+    `half_open_max_calls` probe requests through: a successful probe closes it,
+    a failed one opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, recovery_timeout=30.0, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._last_error = None
+        self._stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _refresh(self):
+        # Called with the lock held: move open -> half-open once the timeout has passed
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._stats["opened"] += 1
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def allow_request(self):
+        """Return True if a call may proceed (reserving a probe slot when half-open)"""
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._stats["successes"] += 1
+            self._failures = 0
+            self._state = self.CLOSED
+            self._probes_in_flight = 0
+
+    def release_probe(self):
+        """Give back a probe slot for a call that ended without an outcome (e.g. an abandoned stream)"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failures += 1
+            self._last_error = repr(error) if error is not None else None
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def snapshot(self):
+        """Current state and counters, for display"""
+        with self._lock:
+            self._refresh()
+            retry_in = None
+            if self._state == self.OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": retry_in,
+                "last_error": self._last_error,
+                **self._stats,
+            }
+
+
+def is_retryable(error):
+    """Timeouts, rate limits (429) and server errors (5xx) are worth retrying"""
+    if isinstance(error, (LLMTimeoutError, TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    return "429" in str(error) or "RESOURCE_EXHAUSTED" in str(error)
+
+
+# Worker threads used to enforce per-call timeouts
+_timeout_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-call")
+
+
+def call_with_timeout(fn, timeout, limiter=None):
+    """
+    Run fn() and raise LLMTimeoutError if it takes longer than timeout seconds.
+    With a limiter, a slot is taken first and held until fn() really returns:
+    a timed-out call keeps running in the pool, so it still counts.
+    """
+    if limiter is not None:
+        limiter.acquire()
+    if timeout is None:
+        try:
+            return fn()
+        finally:
+            if limiter is not None:
+                limiter.release()
+    try:
+        future = _timeout_pool.submit(fn)
+    except BaseException:
+        if limiter is not None:
+            limiter.release()
+        raise
+    if limiter is not None:
+        future.add_done_callback(lambda _: limiter.release())
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+
+
+_STREAM_END = object()
+
+
+def stream_with_timeout(make_stream, timeout, limiter=None):
+    """
+    Yield the chunks of make_stream() (an iterator), raising LLMTimeoutError
+    when no chunk arrives within timeout seconds. The stream is read on a pool
+    thread, which holds the limiter slot until the backend iterator is done; if
+    the consumer stops early or times out, the reader stops at the next chunk.
+    """
+    chunks = queue.Queue()
+    stop = threading.Event()
+
+    def read():
+        try:
+            for chunk in make_stream():
+                if stop.is_set():
+                    break
+                chunks.put(chunk)
+        except BaseException as e:
+            chunks.put(e)
+        finally:
+            chunks.put(_STREAM_END)
+
+    if limiter is not None:
+        limiter.acquire()
+    try:
+        future = _timeout_pool.submit(read)
+    except BaseException:
+        if limiter is not None:
+            limiter.release()
+        raise
+    if limiter is not None:
+        future.add_done_callback(lambda _: limiter.release())
+
+    try:
+        while True:
+            try:
+                chunk = chunks.get(timeout=timeout)
+            except queue.Empty:
+                raise LLMTimeoutError(f"LLM stream stalled for {timeout:.1f}s")
+            if chunk is _STREAM_END:
+                return
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield chunk
+    finally:
+        stop.set()
+
+
+def call_with_retries(fn, breaker=None, retries=2, timeout=20.0, base_delay=0.5, max_delay=4.0, limiter=None):
+    """
+    Call fn() with a per-attempt timeout and up to `retries` retries using
+    full-jitter exponential backoff. Every attempt goes through the breaker
+    and, when given, takes a slot from limiter (time spent queued does not
+    count towards the timeout).
+    """
+    attempt = 0
+    while True:
+        if breaker is not None and not breaker.allow_request():
+            raise CircuitOpenError("LLM circuit breaker is open")
+        try:
+            result = call_with_timeout(fn, timeout, limiter)
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_failure(e)
+            if attempt >= retries or not is_retryable(e):
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+            attempt += 1
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
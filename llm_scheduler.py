@@ -0,0 +1,170 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Identifies the Streamlit session (or batch job) issuing LLM requests
+_current_session = contextvars.ContextVar("llm_session", default="default")
+
+
+def set_session_id(session_id):
+    """Tag LLM requests made from the current context with session_id"""
+    _current_session.set(session_id)
+
+
+def get_session_id():
+    return _current_session.get()
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def try_take(self):
+        """Take a token if available; otherwise return seconds until one is (not thread-safe)"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class _Ticket:
+    __slots__ = ("session_id", "enqueued", "granted")
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class RequestScheduler:
+    """
+    Token-bucket rate limit plus a bounded number of concurrent calls in front
+    of the shared LLM client. Waiting requests are queued per session and
+    granted round-robin across sessions, so one busy session cannot starve
+    the others. Identical in-flight requests can be coalesced into one call.
+    """
+
+    def __init__(self, requests_per_minute=60, burst=10, max_concurrent=4):
+        self.max_concurrent = max_concurrent
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._order = deque()
+        self._active = 0
+        self._waiting = 0
+        self._in_flight = {}
+        self._waits = deque(maxlen=1000)
+        self._stats = {"requests": 0, "coalesced": 0, "max_queue_depth": 0, "max_wait_seconds": 0.0}
+
+    def _dispatch(self):
+        """Grant slots to queued tickets (lock held). Returns seconds until the next token, if throttled."""
+        granted = False
+        wait = None
+        while self._active < self.max_concurrent and self._order:
+            wait = self._bucket.try_take()
+            if wait > 0:
+                break
+            wait = None
+            session_id = self._order.popleft()
+            queue = self._queues[session_id]
+            ticket = queue.popleft()
+            if queue:
+                self._order.append(session_id)
+            else:
+                del self._queues[session_id]
+            ticket.granted = True
+            self._active += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        return wait
+
+    def acquire(self, session_id=None):
+        """Block until a rate-limited concurrency slot is granted; pair with release()"""
+        session_id = session_id or get_session_id()
+        ticket = _Ticket(session_id)
+        with self._cond:
+            self._stats["requests"] += 1
+            if session_id not in self._queues:
+                self._queues[session_id] = deque()
+                self._order.append(session_id)
+            self._queues[session_id].append(ticket)
+            self._waiting += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._waiting)
+            while True:
+                wait = self._dispatch()
+                if ticket.granted:
+                    break
+                self._cond.wait(timeout=wait)
+            self._waiting -= 1
+            waited = time.monotonic() - ticket.enqueued
+            self._waits.append(waited)
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._dispatch()
+            # Wake waiters even if throttled, so one of them waits on the token timer
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session_id=None):
+        """Hold one rate-limited concurrency slot for the duration of the block"""
+        self.acquire(session_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def coalesce(self, key, fn):
+        """Run fn() once for all callers that ask for the same key at the same time"""
+        with self._cond:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._stats["coalesced"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._cond:
+                self._in_flight.pop(key, None)
+
+    def metrics(self):
+        """Queue depth, active calls and wait-time statistics"""
+        with self._cond:
+            waits = sorted(self._waits)
+            metrics = dict(self._stats)
+            metrics.update({
+                "queue_depth": self._waiting,
+                "active": self._active,
+                "sessions_waiting": len(self._queues),
+                "in_flight_keys": len(self._in_flight),
+                "avg_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+                "p95_wait_seconds": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            })
+        return metrics
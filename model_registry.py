@@ -0,0 +1,146 @@
+"""
+Local registry of trained models.
+
+    model_registry/
+        versions/<version>/   one model artifact per version (see model_artifact)
+        staging/              artifacts being written, renamed into versions/
+        CURRENT               version id served by load_model
+        history.json          versions that have been current, oldest first
+
+Versions are immutable once published. Publishing writes the artifact to a
+temporary directory and renames it into place, and CURRENT is replaced
+atomically, so switching or rolling back models never requires retraining
+and readers never see a half-written model.
+"""
+import json
+import os
+import threading
+
+from model_artifact import save_artifact, read_metadata
+
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _versions_dir():
+    return os.path.join(REGISTRY_DIR, "versions")
+
+
+def _staging_dir():
+    return os.path.join(REGISTRY_DIR, "staging")
+
+
+def _current_path():
+    return os.path.join(REGISTRY_DIR, "CURRENT")
+
+
+def _history_path():
+    return os.path.join(REGISTRY_DIR, "history.json")
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def version_dir(version):
+    """Artifact directory of a version"""
+    return os.path.join(_versions_dir(), version)
+
+
+def is_version_id(name):
+    """Version ids never contain dots (temporary and backup directories do)"""
+    return bool(name) and "." not in name and os.sep not in name
+
+
+def version_exists(version):
+    return is_version_id(version) and os.path.exists(os.path.join(version_dir(version), "metadata.json"))
+
+
+def get_current_version():
+    """Version id the registry currently serves, or None"""
+    try:
+        with open(_current_path()) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return version or None
+
+
+def _read_history():
+    try:
+        with open(_history_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def set_current(version):
+    """Point CURRENT at a published version"""
+    if not version_exists(version):
+        raise ValueError(f"Model version '{version}' is not in the registry")
+    with _REGISTRY_LOCK:
+        history = _read_history()
+        if not history or history[-1] != version:
+            history.append(version)
+            _write_atomic(_history_path(), json.dumps(history))
+        _write_atomic(_current_path(), version)
+    return version
+
+
+def rollback():
+    """Make the previously current version current again; returns it (None if there is none)"""
+    with _REGISTRY_LOCK:
+        history = [version for version in _read_history() if version_exists(version)]
+        if len(history) < 2:
+            return None
+        history.pop()
+        _write_atomic(_history_path(), json.dumps(history))
+        _write_atomic(_current_path(), history[-1])
+        return history[-1]
+
+
+def publish(model, preprocessor, metadata, make_current=True):
+    """Store a trained model as a new immutable version (named by metadata['version'])"""
+    version = metadata['version']
+    if not is_version_id(version):
+        raise ValueError(f"Invalid model version id '{version}'")
+    os.makedirs(_versions_dir(), exist_ok=True)
+    os.makedirs(_staging_dir(), exist_ok=True)
+    if os.path.exists(version_dir(version)):
+        raise ValueError(f"Model version '{version}' already exists")
+    # Staged outside versions/, so a half-written artifact is never listed
+    save_artifact(version_dir(version), model, preprocessor, metadata, staging_dir=_staging_dir())
+    if make_current:
+        set_current(version)
+    return version
+
+
+def get_version_metadata(version):
+    """Metadata sidecar of a version, or None"""
+    try:
+        return read_metadata(version_dir(version))
+    except (OSError, ValueError):
+        return None
+
+
+def list_versions():
+    """Metadata of every published version, newest first, with a 'current' flag"""
+    try:
+        versions = os.listdir(_versions_dir())
+    except OSError:
+        return []
+    current = get_current_version()
+    entries = []
+    for version in versions:
+        if not is_version_id(version):
+            continue
+        metadata = get_version_metadata(version)
+        if metadata is None:
+            continue
+        entries.append(dict(metadata, version=version, current=version == current))
+    entries.sort(key=lambda entry: entry.get('trained_at') or 0, reverse=True)
+    return entries
@@ -0,0 +1,249 @@
+"""
+Hyperparameter search for the training pipeline.
+
+    python model_search.py --data extract.csv --estimator hist_gradient_boosting --n-iter 8
+
+Candidate settings are scored on the same folds (rolling-origin when the data
+spans enough months, otherwise one random 80/20 split) in parallel worker
+processes. The feature matrix and fold indices are written once as .npy files
+that workers memory-map, so they are shared through the page cache rather
+than pickled per task. Scores are cached per dataset fingerprint and settings,
+and the best setting is retrained and saved with its leaderboard.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from data_utils import dataset_fingerprint, hash_bytes, parse_dataset, register_fingerprint
+from threadpoolctl import threadpool_limits
+
+from model_utils import (
+    ESTIMATORS, DEFAULT_ESTIMATOR, BACKTEST_FOLDS,
+    build_training_matrices, categorical_features, backtest_windows,
+    fit_estimator, evaluate_model, run_model_pipeline, worker_threads
+)
+
+SEARCH_DIR = ".model_search"
+SEARCH_RESULTS_PATH = os.path.join(SEARCH_DIR, "results.json")
+
+# Part of every fold directory and result key; bump when folds or scoring change
+SEARCH_FORMAT = 2
+
+# Settings tried for each backend (the full grid, or a random sample of it)
+SEARCH_SPACES = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [12, 25, None],
+        'min_samples_leaf': [1, 5],
+    },
+    'hist_gradient_boosting': {
+        'learning_rate': [0.05, 0.1, 0.2],
+        'max_leaf_nodes': [31, 63, 127],
+        'l2_regularization': [0.0, 1.0],
+    },
+}
+
+_RESULTS_LOCK = threading.Lock()
+
+
+def search_candidates(estimator, space=None, n_iter=None, seed=42):
+    """Every combination of the search space, or n_iter of them sampled at random"""
+    space = space or SEARCH_SPACES[estimator]
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if n_iter and n_iter < len(grid):
+        grid = random.Random(seed).sample(grid, n_iter)
+    return grid
+
+
+def _result_key(fingerprint, estimator, params, folds):
+    return f"v{SEARCH_FORMAT}|{fingerprint}|{estimator}|{folds}|{json.dumps(params, sort_keys=True)}"
+
+
+def load_search_results():
+    """All cached search scores, keyed by dataset fingerprint, backend, folds and settings"""
+    try:
+        with open(SEARCH_RESULTS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_search_result(key, result):
+    """Add one score to the JSON result cache (write-then-rename)"""
+    with _RESULTS_LOCK:
+        results = load_search_results()
+        results[key] = result
+        os.makedirs(SEARCH_DIR, exist_ok=True)
+        tmp_path = f"{SEARCH_RESULTS_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(results, f)
+        os.replace(tmp_path, SEARCH_RESULTS_PATH)
+
+
+def write_fold_matrices(fingerprint, X, y_log, months, folds=BACKTEST_FOLDS):
+    """
+    Save X, y and the train/test row indices of every fold as .npy files
+    under SEARCH_DIR/<fingerprint>-<folds>. Rolling-origin folds also store the
+    month of every training row, so candidates early-stop on the last training
+    month as run_model_pipeline does. Returns (directory, number of folds).
+    """
+    directory = os.path.join(SEARCH_DIR, f"v{SEARCH_FORMAT}-{fingerprint}-{folds}")
+    manifest_path = os.path.join(directory, "folds.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return directory, json.load(f)["folds"]
+
+    splits = []
+    for start, end in backtest_windows(months, folds):
+        train = np.flatnonzero(months < start)
+        test = np.flatnonzero((months >= start) & (months < end))
+        if len(train) and len(test):
+            splits.append((train, test, months[train]))
+    if not splits:
+        # Too few months for rolling origins: one shuffled 80/20 split
+        train, test = train_test_split(np.arange(len(X)), test_size=0.2, random_state=42)
+        splits = [(train, test, None)]
+
+    tmp_dir = f"{directory}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.save(os.path.join(tmp_dir, "X.npy"), np.ascontiguousarray(X, dtype=np.float32))
+    np.save(os.path.join(tmp_dir, "y.npy"), np.asarray(y_log, dtype=np.float64))
+    for i, (train, test, train_months) in enumerate(splits):
+        np.save(os.path.join(tmp_dir, f"train_{i}.npy"), train)
+        np.save(os.path.join(tmp_dir, f"test_{i}.npy"), test)
+        if train_months is not None:
+            np.save(os.path.join(tmp_dir, f"train_months_{i}.npy"), train_months)
+    with open(os.path.join(tmp_dir, "folds.json"), "w") as f:
+        json.dump({"folds": len(splits)}, f)
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        # Another search wrote the same folds first; its files are identical
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return directory, len(splits)
+
+
+def _evaluate_candidate(task):
+    """Score one setting on every fold (runs in a worker process)"""
+    directory, n_folds, estimator, params, features, categorical, threads = task
+    X = np.load(os.path.join(directory, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(directory, "y.npy"), mmap_mode="r")
+
+    started = time.perf_counter()
+    fold_r2, fold_mae = [], []
+    for i in range(n_folds):
+        train = np.load(os.path.join(directory, f"train_{i}.npy"))
+        test = np.load(os.path.join(directory, f"test_{i}.npy"))
+        months_path = os.path.join(directory, f"train_months_{i}.npy")
+        train_months = np.load(months_path) if os.path.exists(months_path) else None
+        with threadpool_limits(limits=threads):
+            model = fit_estimator(estimator, X[train], y[train], train_months, features=features,
+                                  categorical=categorical, params=params, n_jobs=threads)
+            r2, mae = evaluate_model(model, X[test], y[test])
+        fold_r2.append(float(r2))
+        fold_mae.append(float(mae))
+    return {
+        'estimator': estimator,
+        'params': params,
+        'r2_score': float(np.mean(fold_r2)),
+        'mae': float(np.mean(fold_mae)),
+        'fold_r2': fold_r2,
+        'seconds': time.perf_counter() - started
+    }
+
+
+def run_search(df, estimator=DEFAULT_ESTIMATOR, space=None, n_iter=None, n_workers=None,
+               folds=BACKTEST_FOLDS, persist_best=True, validation='time', progress=None):
+    """
+    Evaluate candidate settings for estimator on df and return the leaderboard
+    (best mean R² first). Settings already scored on this dataset are read from
+    the result cache. With persist_best, the winner is retrained through
+    run_model_pipeline and saved together with the leaderboard.
+    progress(done, total) is called as candidates finish.
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator '{estimator}'. Choose from: {', '.join(ESTIMATORS)}")
+
+    fingerprint = dataset_fingerprint(df)
+    X, y, months, features, preprocessor = build_training_matrices(df)
+    categorical = categorical_features(preprocessor)
+    directory, n_folds = write_fold_matrices(fingerprint, X, y, months, folds)
+    del X, y
+
+    candidates = search_candidates(estimator, space, n_iter)
+    cached = load_search_results()
+    leaderboard, pending = [], []
+    for params in candidates:
+        key = _result_key(fingerprint, estimator, params, n_folds)
+        if key in cached:
+            leaderboard.append(dict(cached[key], cached=True))
+        else:
+            pending.append((key, (directory, n_folds, estimator, params, features, categorical)))
+    print(f"🔍 {len(candidates)} candidates: {len(leaderboard)} cached, {len(pending)} to evaluate on {n_folds} folds")
+
+    def record(key, result):
+        _save_search_result(key, result)
+        leaderboard.append(dict(result, cached=False))
+        if progress:
+            progress(len(leaderboard), len(candidates))
+
+    n_workers = min(n_workers or os.cpu_count() or 1, len(pending))
+    if n_workers <= 1:
+        for key, task in pending:
+            record(key, _evaluate_candidate(task + (None,)))
+    else:
+        # Workers x threads per worker stays within the cores
+        threads = worker_threads(n_workers)
+        # spawn rather than fork: the app process runs threads
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(_evaluate_candidate, task + (threads,)): key for key, task in pending}
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+
+    leaderboard.sort(key=lambda result: result['r2_score'], reverse=True)
+    for rank, result in enumerate(leaderboard, 1):
+        result['rank'] = rank
+
+    if persist_best and leaderboard:
+        best = leaderboard[0]
+        print(f"🏆 Best settings: {best['params']} (mean R² {best['r2_score']:.4f})")
+        run_model_pipeline(df, estimator=estimator, validation=validation,
+                           params=best['params'], search_leaderboard=leaderboard)
+    return leaderboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="CSV extract to tune on")
+    parser.add_argument("--estimator", choices=list(ESTIMATORS), default=DEFAULT_ESTIMATOR)
+    parser.add_argument("--n-iter", type=int, help="random sample size (default: full grid)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--folds", type=int, default=BACKTEST_FOLDS)
+    parser.add_argument("--no-save", action="store_true", help="only print the leaderboard")
+    args = parser.parse_args()
+
+    with open(args.data, "rb") as f:
+        raw_bytes = f.read()
+    df = parse_dataset(raw_bytes)
+    register_fingerprint(df, hash_bytes(raw_bytes))
+
+    leaderboard = run_search(df, args.estimator, n_iter=args.n_iter, n_workers=args.workers,
+                             folds=args.folds, persist_best=not args.no_save)
+    for result in leaderboard:
+        note = " (cached)" if result['cached'] else ""
+        print(f"{result['rank']:>3}. R² {result['r2_score']:.4f}  MAE {result['mae']:.2f}  {result['params']}{note}")
+
+
+if __name__ == "__main__":
+    main()
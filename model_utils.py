@@ -1,17 +1,170 @@
 import os
+import inspect
+import multiprocessing
 import pickle
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 from sklearn.cluster import KMeans
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import mean_absolute_error, r2_score
+from threadpoolctl import threadpool_limits
+from collections import OrderedDict
 
-MODEL_PATH = "aadhaar_model.pkl"
+from data_utils import dataset_fingerprint
+from model_artifact import load_artifact, artifact_size_mb, process_rss_mb
+import model_registry
 
-def preprocess_data(df):
-    """Preprocess dataframe with feature engineering"""
+# Models written by older versions (an artifact directory or a single pickle);
+# imported into the registry the first time no registry version is current
+LEGACY_MODEL_DIR = "aadhaar_model"
+LEGACY_MODEL_PATH = "aadhaar_model.pkl"
+
+# Process-wide cache of the loaded model bundle (keyed on registry version), shared by all sessions
+_MODEL_CACHE = {'key': None, 'data': None, 'format': None, 'load_seconds': None}
+_MODEL_LOCK = threading.Lock()
+
+# Predictions and their summary keyed on (dataset fingerprint, model version)
+MAX_CACHED_PREDICTIONS = 8
+_PREDICTION_CACHE = OrderedDict()
+_PREDICTION_LOCK = threading.Lock()
+_PREDICTION_STATS = {'hits': 0, 'misses': 0}
+
+CLUSTER_COLS = ['age_0_5', 'age_5_17', 'age_18_greater',
+                'demo_age_5_17', 'demo_age_18_greater',
+                'bio_age_5_17', 'bio_age_18_greater']
+
+# Code assigned to states/districts that were not seen during training
+UNKNOWN_CODE = -1
+
+# Raw columns the feature pipeline reads; everything else is left behind
+INPUT_COLUMNS = ['state', 'district', 'pincode', 'date', 'total_activity'] + CLUSTER_COLS
+
+# Rows per inference batch
+PREDICT_BATCH_ROWS = 65_536
+
+# Lag offsets and rolling window lengths, in calendar months
+LAG_MONTHS = (1, 12)
+ROLLING_WINDOWS = (3,)
+
+# Largest number of categories a feature can have to be treated as native categorical
+MAX_CATEGORICAL_CARDINALITY = 255
+
+def _random_forest(categorical_mask, **params):
+    settings = dict(n_estimators=100, max_depth=25, random_state=42, n_jobs=-1)
+    settings.update(params)
+    return RandomForestRegressor(**settings)
+
+def _hist_gradient_boosting(categorical_mask, **params):
+    # Stops once the validation loss has not improved for 20 iterations
+    settings = dict(
+        max_iter=500,
+        learning_rate=0.1,
+        max_leaf_nodes=63,
+        early_stopping=True,
+        n_iter_no_change=20,
+        categorical_features=categorical_mask if any(categorical_mask) else None,
+        random_state=42
+    )
+    settings.update(params)
+    return HistGradientBoostingRegressor(**settings)
+
+# Training backends selectable in run_model_pipeline
+ESTIMATORS = {
+    'random_forest': {
+        'label': 'RandomForest',
+        'settings': '100 trees, depth 25',
+        'factory': _random_forest,
+        'native_categorical': False,
+    },
+    'hist_gradient_boosting': {
+        'label': 'HistGradientBoosting',
+        'settings': 'up to 500 iterations, early stopping',
+        'factory': _hist_gradient_boosting,
+        'native_categorical': True,
+    },
+}
+DEFAULT_ESTIMATOR = 'random_forest'
+
+# Time-based validation: hold out the last months, then backtest over rolling origins
+VALIDATION_MODES = ('time', 'random')
+HOLDOUT_MONTHS = 3
+BACKTEST_FOLDS = 3
+BACKTEST_HORIZON_MONTHS = 1
+
+def lag_feature_names(lags=LAG_MONTHS, windows=ROLLING_WINDOWS):
+    """Column names produced by add_lag_features"""
+    return [f'lag_{k}m' for k in lags] + [f'rolling_{w}m' for w in windows]
+
+def add_lag_features(df, lags=LAG_MONTHS, windows=ROLLING_WINDOWS, value_col='total_activity'):
+    """
+    Add per-pincode lag and rolling-mean features on a monthly calendar.
+    Activity is summed per (pincode, month); lag_Km is the pincode's total K months
+    earlier and rolling_Wm the mean of the W months before, with missing months
+    counted as zero. Row order is preserved and df is modified in place.
+    """
+    names = lag_feature_names(lags, windows)
+    required = ['pincode', 'date', value_col]
+    if len(df) == 0 or any(c not in df.columns for c in required):
+        for name in names:
+            df[name] = np.float32(0)
+        return df
+    
+    pin_codes = pd.factorize(df['pincode'])[0]
+    dates = df['date']
+    month_idx = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype='float64')
+    valid = (pin_codes >= 0) & ~np.isnan(month_idx)
+    
+    outputs = {name: np.zeros(len(df), dtype=np.float32) for name in names}
+    if not valid.any():
+        for name in names:
+            df[name] = outputs[name]
+        return df
+    
+    # One integer key per (pincode, month). Each pincode owns a block of `span`
+    # keys padded by `pad`, so looking back up to max_offset months never lands
+    # in the previous pincode's block.
+    month_idx = month_idx[valid].astype(np.int64)
+    max_offset = max(list(lags) + list(windows) + [0])
+    pad = max_offset + 1
+    span = int(month_idx.max() - month_idx.min()) + 1 + pad
+    keys = pin_codes[valid].astype(np.int64) * span + (month_idx - month_idx.min()) + pad
+    
+    values = pd.to_numeric(df[value_col], errors='coerce').to_numpy(dtype='float64')[valid]
+    values = np.nan_to_num(values)
+    
+    # Monthly totals on the sorted (pincode, month) grid
+    grid_keys, row_to_grid = np.unique(keys, return_inverse=True)
+    monthly = np.bincount(row_to_grid, weights=values)
+    del keys, values
+    
+    for k in lags:
+        target = grid_keys - k
+        pos = np.searchsorted(grid_keys, target)
+        np.minimum(pos, len(grid_keys) - 1, out=pos)
+        lagged = np.where(grid_keys[pos] == target, monthly[pos], 0.0)
+        outputs[f'lag_{k}m'][valid] = lagged[row_to_grid]
+    
+    if windows:
+        # Window sums as differences of the running total; the running total
+        # spans pincodes but both ends of a window fall inside the same block
+        running = np.concatenate(([0.0], np.cumsum(monthly)))
+        upper = running[np.searchsorted(grid_keys, grid_keys - 1, side='right')]
+        for w in windows:
+            lower = running[np.searchsorted(grid_keys, grid_keys - w - 1, side='right')]
+            outputs[f'rolling_{w}m'][valid] = ((upper - lower) / w)[row_to_grid]
+    
+    for name in names:
+        df[name] = outputs[name]
+    return df
+
+def add_base_features(df, lags=LAG_MONTHS, windows=ROLLING_WINDOWS):
+    """Add date and lag features (no fitted state involved)"""
     df = df.copy()
     
     # Date features
@@ -27,143 +180,502 @@ def preprocess_data(df):
     # Ensure pincode is string
     if 'pincode' in df.columns:
         df['pincode'] = df['pincode'].astype(str)
-        df = df.sort_values(['pincode', 'date'] if 'date' in df.columns else ['pincode'])
-        
-        # LAG 1 (Previous Month)
-        df['lag_1m'] = df['total_activity'].shift(1)
-        mask_1 = df['pincode'] == df['pincode'].shift(1)
-        df.loc[~mask_1, 'lag_1m'] = 0
-        
-        # LAG 12 (Seasonality - Last Year)
-        df['lag_12m'] = df['total_activity'].shift(12)
-        mask_12 = df['pincode'] == df['pincode'].shift(12)
-        df.loc[~mask_12, 'lag_12m'] = 0
-        
-        # ROLLING 3 MONTHS (Trend)
-        v1 = df['total_activity'].shift(1)
-        v2 = df['total_activity'].shift(2)
-        v3 = df['total_activity'].shift(3)
-        mask_roll = (df['pincode'] == df['pincode'].shift(1)) & \
-                    (df['pincode'] == df['pincode'].shift(2)) & \
-                    (df['pincode'] == df['pincode'].shift(3))
-        df['rolling_3m'] = (v1 + v2 + v3) / 3
-        df.loc[~mask_roll, 'rolling_3m'] = 0
-    else:
-        df['lag_1m'] = 0
-        df['lag_12m'] = 0
-        df['rolling_3m'] = 0
     
-    # Fill NaNs
-    df.fillna(0, inplace=True)
+    add_lag_features(df, lags, windows)
+    
+    # Fill NaNs in numeric columns (categoricals and dates are left as they are)
+    numeric_cols = df.select_dtypes(include='number').columns
+    df[numeric_cols] = df[numeric_cols].fillna(0)
     
-    # Clustering
-    cluster_cols = ['age_0_5', 'age_5_17', 'age_18_greater',
-                    'demo_age_5_17', 'demo_age_18_greater',
-                    'bio_age_5_17', 'bio_age_18_greater']
-    valid_cols = [c for c in cluster_cols if c in df.columns]
+    return df
+
+def fit_clusterer(df):
+    """Fit the activity clusterer on df; returns (kmeans or None, cluster columns)"""
+    valid_cols = [c for c in CLUSTER_COLS if c in df.columns]
     
+    kmeans = None
     if valid_cols and len(df) >= 3:
         kmeans = KMeans(n_clusters=min(3, len(df)), random_state=42, n_init=10)
-        df['cluster_label'] = kmeans.fit_predict(df[valid_cols])
+        kmeans.fit(df[valid_cols])
+    return kmeans, valid_cols
+
+def fit_preprocessor(df, lags=LAG_MONTHS, windows=ROLLING_WINDOWS):
+    """Fit the clusterer and label encoders on feature-engineered training data"""
+    kmeans, valid_cols = fit_clusterer(df)
+    
+    le_state = None
+    if 'state' in df.columns:
+        le_state = LabelEncoder().fit(df['state'].astype(str))
+    
+    le_dist = None
+    if 'district' in df.columns:
+        le_dist = LabelEncoder().fit(df['district'].astype(str))
+    
+    return {
+        'kmeans': kmeans,
+        'cluster_cols': valid_cols,
+        'le_state': le_state,
+        'le_dist': le_dist,
+        'lags': tuple(lags),
+        'windows': tuple(windows)
+    }
+
+def _encode(values, encoder):
+    """Label-encode values, mapping classes unseen at fit time to UNKNOWN_CODE"""
+    if encoder is None:
+        return np.full(len(values), UNKNOWN_CODE, dtype=np.int32)
+    codes = pd.Categorical(values.astype(str), categories=encoder.classes_).codes
+    return codes.astype(np.int32)
+
+def transform_features(df, preprocessor):
+    """Apply a fitted preprocessor (cluster + encoders) without refitting anything"""
+    kmeans = preprocessor.get('kmeans')
+    cluster_cols = preprocessor.get('cluster_cols', [])
+    if kmeans is None and preprocessor.get('refit_clusterer'):
+        # Legacy models saved no clusterer; their labels were always fit on the data at hand
+        kmeans, cluster_cols = fit_clusterer(df)
+    
+    if kmeans is not None and cluster_cols:
+        X_cluster = df.reindex(columns=cluster_cols, fill_value=0)
+        df['cluster_label'] = kmeans.predict(X_cluster)
     else:
         df['cluster_label'] = 0
     
-    # Encode categorical columns
-    le_state = LabelEncoder()
-    le_dist = LabelEncoder()
-    
+    # Unseen states/districts get UNKNOWN_CODE rather than a colliding code
     if 'state' in df.columns:
-        df['state_code'] = le_state.fit_transform(df['state'].astype(str))
+        df['state_code'] = _encode(df['state'], preprocessor.get('le_state'))
     else:
         df['state_code'] = 0
         
     if 'district' in df.columns:
-        df['district_code'] = le_dist.fit_transform(df['district'].astype(str))
+        df['district_code'] = _encode(df['district'], preprocessor.get('le_dist'))
     else:
         df['district_code'] = 0
     
-    return df, le_state, le_dist
+    return df
+
+def preprocess_data(df, preprocessor=None, lags=LAG_MONTHS, windows=ROLLING_WINDOWS):
+    """
+    Preprocess dataframe with feature engineering.
+    Fits a new preprocessor when none is given (training), otherwise only transforms (inference).
+    """
+    if preprocessor is not None:
+        lags = preprocessor.get('lags', (1, 12))
+        windows = preprocessor.get('windows', (3,))
+    
+    df = add_base_features(df, lags, windows)
+    
+    if preprocessor is None:
+        preprocessor = fit_preprocessor(df, lags, windows)
+    
+    df = transform_features(df, preprocessor)
+    return df, preprocessor
+
+def categorical_features(preprocessor):
+    """Encoded columns small enough to be used as native categorical features"""
+    categorical = []
+    for feature, encoder in (('state_code', preprocessor.get('le_state')), ('district_code', preprocessor.get('le_dist'))):
+        if encoder is not None and len(encoder.classes_) <= MAX_CATEGORICAL_CARDINALITY:
+            categorical.append(feature)
+    return categorical
+
+def fit_estimator(name, X_train, y_train, months=None, features=(), categorical=(), params=None, n_jobs=None):
+    """
+    Build the backend registered under name (with params overriding its
+    defaults) and fit it. Backends with native categorical support treat the
+    columns in categorical as categories. Early-stopping backends whose fit()
+    accepts a validation set monitor the last training month (given the month
+    of every training row), and otherwise their own random validation_fraction,
+    so the rows the caller scores on are never used for model selection.
+    n_jobs overrides the backend's joblib n_jobs (for fits inside pool workers).
+    """
+    if name not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator '{name}'. Choose from: {', '.join(ESTIMATORS)}")
+    spec = ESTIMATORS[name]
+    
+    mask = [spec['native_categorical'] and feature in categorical for feature in features]
+    model = spec['factory'](mask, **(params or {}))
+    if n_jobs is not None and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=n_jobs)
+    
+    if months is not None and 'X_val' in inspect.signature(model.fit).parameters:
+        split = time_holdout_split(np.asarray(months), 1)
+        if split is not None:
+            fit_mask, stop_mask = split
+            model.fit(X_train[fit_mask], y_train[fit_mask], X_val=X_train[stop_mask], y_val=y_train[stop_mask])
+            return model
+    model.fit(X_train, y_train)
+    return model
+
+def evaluate_model(model, X_test, y_test_log):
+    """R² and MAE on the original scale for a model trained on log1p targets"""
+    y_pred_real = np.expm1(model.predict(X_test))
+    y_test_real = np.expm1(y_test_log)
+    return r2_score(y_test_real, y_pred_real), mean_absolute_error(y_test_real, y_pred_real)
+
+def month_index(df_clean):
+    """Calendar month number (year * 12 + month - 1) of every feature-engineered row"""
+    return df_clean['year'].to_numpy(dtype=np.int64) * 12 + df_clean['month'].to_numpy(dtype=np.int64) - 1
+
+def month_label(month):
+    return f"{month // 12}-{month % 12 + 1:02d}"
+
+def time_holdout_split(months, holdout_months=HOLDOUT_MONTHS):
+    """(train, validation) row masks holding out the last holdout_months months, or None if there are too few months"""
+    distinct = np.unique(months)
+    if len(distinct) <= holdout_months:
+        return None
+    cutoff = distinct[-holdout_months]
+    return months < cutoff, months >= cutoff
+
+def backtest_windows(months, folds=BACKTEST_FOLDS, horizon_months=BACKTEST_HORIZON_MONTHS):
+    """
+    Rolling-origin (start, end) month windows, oldest first. Each fold trains on
+    all months before start and tests on the months in [start, end).
+    """
+    distinct = np.unique(months)
+    windows = []
+    for k in range(folds, 0, -1):
+        position = len(distinct) - k * horizon_months
+        if position < 1:
+            continue
+        end = distinct[position + horizon_months] if position + horizon_months < len(distinct) else distinct[-1] + 1
+        windows.append((int(distinct[position]), int(end)))
+    return windows
+
+def worker_threads(n_workers):
+    """Threads each of n_workers pool processes may use, so they never oversubscribe the cores"""
+    return max(1, (os.cpu_count() or 1) // n_workers)
+
+def _run_backtest_fold(task):
+    """Train and score one backtest fold (runs in a worker process)"""
+    estimator, X_train, y_train, train_months, X_test, y_test, features, categorical, params, start, threads = task
+    started = time.perf_counter()
+    # threads caps joblib (n_jobs) and the OpenMP/BLAS pools (e.g. HistGradientBoosting)
+    with threadpool_limits(limits=threads):
+        model = fit_estimator(estimator, X_train, y_train, train_months, features=features,
+                              categorical=categorical, params=params, n_jobs=threads)
+        r2, mae = evaluate_model(model, X_test, y_test)
+    return {
+        'cutoff': month_label(start),
+        'train_rows': len(X_train),
+        'test_rows': len(X_test),
+        'r2_score': float(r2),
+        'mae': float(mae),
+        'seconds': time.perf_counter() - started
+    }
+
+def run_backtest(X, y_log, months, estimator=DEFAULT_ESTIMATOR, features=(), categorical=(),
+                 folds=BACKTEST_FOLDS, horizon_months=BACKTEST_HORIZON_MONTHS, n_workers=None, params=None):
+    """
+    Rolling-origin backtest: for each cutoff, train on earlier months and score
+    the next horizon_months. Folds run in parallel worker processes.
+    Returns one metrics dict per fold, oldest cutoff first.
+    """
+    windows = [
+        (months < start, (months >= start) & (months < end), start)
+        for start, end in backtest_windows(months, folds, horizon_months)
+    ]
+    windows = [(train, test, start) for train, test, start in windows if train.any() and test.any()]
+    
+    n_workers = min(n_workers or os.cpu_count() or 1, len(windows))
+    threads = worker_threads(n_workers) if n_workers > 1 else None
+    tasks = [
+        (estimator, X[train], y_log[train], months[train], X[test], y_log[test],
+         list(features), list(categorical), params, start, threads)
+        for train, test, start in windows
+    ]
+    if n_workers <= 1:
+        return [_run_backtest_fold(task) for task in tasks]
+    # spawn rather than fork: the app process runs threads
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(_run_backtest_fold, tasks))
 
-def run_model_pipeline(df):
-    """Train model with full pipeline and save as .pkl file"""
+def build_training_matrices(df):
+    """
+    Feature-engineer df for training. Returns (X, y_log, months, features,
+    preprocessor) with X as float32 in the layout predict_activity uses.
+    """
     print("⚙️ Preprocessing data...")
-    df_clean, le_state, le_dist = preprocess_data(df)
+    df_clean, preprocessor = preprocess_data(df)
     
     # Log transform target
     y_target_log = np.log1p(df_clean['total_activity'])
     
     # Features
     X_features = [
-        'state_code', 'district_code', 'month', 'year', 'cluster_label',
-        'lag_1m', 'rolling_3m', 'lag_12m'
-    ]
+        'state_code', 'district_code', 'month', 'year', 'cluster_label'
+    ] + lag_feature_names(preprocessor['lags'], preprocessor['windows'])
     
     # Ensure all features exist
     for feat in X_features:
         if feat not in df_clean.columns:
             df_clean[feat] = 0
     
-    X = df_clean[X_features]
-    y = y_target_log
-    
-    X_train, X_test, y_train_log, y_test_log = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
-    
-    print("🚀 Training RandomForest model...")
-    rf_model = RandomForestRegressor(
-        n_estimators=100, 
-        max_depth=25, 
-        random_state=42, 
-        n_jobs=-1
+    # Same float32 layout that predict_activity feeds the model
+    X = df_clean[X_features].to_numpy(dtype=np.float32)
+    y = y_target_log.to_numpy()
+    months = month_index(df_clean)
+    return X, y, months, X_features, preprocessor
+
+def run_model_pipeline(df, estimator=DEFAULT_ESTIMATOR, validation='time', holdout_months=HOLDOUT_MONTHS,
+                       backtest_folds=BACKTEST_FOLDS, params=None, search_leaderboard=None, name=None):
+    """
+    Train model with full pipeline and publish it to the model registry as
+    the current version (name is an optional label, e.g. a zone or vintage).
+    validation='time' scores the model on the last holdout_months months (after
+    training on the earlier ones), runs a rolling-origin backtest and then
+    refits on all months for publishing; validation='random' uses a shuffled
+    80/20 split. params override the
+    backend's default settings; a search leaderboard is saved with the model.
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator '{estimator}'. Choose from: {', '.join(ESTIMATORS)}")
+    if validation not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode '{validation}'. Choose from: {', '.join(VALIDATION_MODES)}")
+    
+    X, y, months, X_features, preprocessor = build_training_matrices(df)
+    categorical = categorical_features(preprocessor)
+    
+    split = time_holdout_split(months, holdout_months) if validation == 'time' else None
+    if split is not None:
+        train_mask, test_mask = split
+        X_train, X_test, y_train_log, y_test_log = X[train_mask], X[test_mask], y[train_mask], y[test_mask]
+        train_months = months[train_mask]
+        validation_info = {
+            'mode': 'time',
+            'holdout_months': holdout_months,
+            'holdout_start': month_label(int(months[test_mask].min()))
+        }
+    else:
+        if validation == 'time':
+            print(f"⚠️ Fewer than {holdout_months + 1} months of data, falling back to a random split")
+        X_train, X_test, y_train_log, y_test_log = train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
+        train_months = None
+        validation_info = {'mode': 'random', 'test_size': 0.2}
+    validation_info.update({'train_rows': len(X_train), 'validation_rows': len(X_test)})
+    
+    print(f"🚀 Training {ESTIMATORS[estimator]['label']} model...")
+    started = time.perf_counter()
+    model = fit_estimator(
+        estimator, X_train, y_train_log, train_months,
+        features=X_features, categorical=categorical, params=params
     )
-    rf_model.fit(X_train, y_train_log)
-    print("✅ Model trained!")
+    training_time = time.perf_counter() - started
+    print(f"✅ Model trained in {training_time:.1f}s!")
     
     # Evaluate
-    y_pred_log = rf_model.predict(X_test)
-    y_pred_real = np.expm1(y_pred_log)
-    y_test_real = np.expm1(y_test_log)
-    
-    mae = mean_absolute_error(y_test_real, y_pred_real)
-    r2 = r2_score(y_test_real, y_pred_real)
-    
-    # Save model and encoders
+    r2, mae = evaluate_model(model, X_test, y_test_log)
+    
+    backtest = []
+    if validation_info['mode'] == 'time' and backtest_folds:
+        print(f"🔁 Backtesting over {backtest_folds} rolling origins...")
+        backtest = run_backtest(X, y, months, estimator, X_features, categorical, folds=backtest_folds, params=params)
+    
+    if validation_info['mode'] == 'time':
+        # The holdout months are the most recent ones: the served model is refit
+        # on every month, while the metrics above stay those of the holdout run
+        print("🚀 Refitting on all months...")
+        started = time.perf_counter()
+        model = fit_estimator(
+            estimator, X, y, months,
+            features=X_features, categorical=categorical, params=params
+        )
+        training_time += time.perf_counter() - started
+        validation_info['refit_rows'] = len(X)
+    
+    # Save model together with the fitted clusterer and encoders
     model_data = {
-        'model': rf_model,
-        'le_state': le_state,
-        'le_dist': le_dist,
+        'model': model,
+        'preprocessor': preprocessor,
+        'le_state': preprocessor['le_state'],
+        'le_dist': preprocessor['le_dist'],
         'features': X_features,
         'r2_score': r2,
-        'mae': mae
+        'mae': mae,
+        'backend': estimator,
+        'params': params or {},
+        'training_time': training_time,
+        'validation': validation_info,
+        'backtest': backtest,
+        'search_leaderboard': search_leaderboard or [],
+        'dataset_hash': dataset_fingerprint(df),
+        'name': name,
+        'version': uuid.uuid4().hex,
+        'trained_at': time.time()
     }
     
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(model_data, f)
+    # Tree arrays are stored for memory-mapping; metrics and encoders go to small sidecars
+    version = model_registry.publish(model, preprocessor, model_metadata(model_data))
+    reload_model()
     
-    print(f"💾 Model saved to {MODEL_PATH}")
+    directory = model_registry.version_dir(version)
+    print(f"💾 Model saved to {directory}/ ({artifact_size_mb(directory):.1f} MB)")
     print(f"📊 R² Score: {r2:.5f}, MAE: {mae:.1f}")
     
     return r2, mae
 
-def load_model():
-    """Load the trained model from .pkl file"""
-    if not os.path.exists(MODEL_PATH):
-        return None
-    
+def model_metadata(model_data):
+    """The JSON-serialisable part of a model bundle (everything except the fitted objects)"""
+    return {
+        'version': model_data.get('version'),
+        'trained_at': model_data.get('trained_at'),
+        'features': model_data.get('features'),
+        'r2_score': model_data.get('r2_score'),
+        'mae': model_data.get('mae'),
+        'backend': model_data.get('backend', DEFAULT_ESTIMATOR),
+        'training_time': model_data.get('training_time'),
+        'validation': model_data.get('validation'),
+        'backtest': model_data.get('backtest', []),
+        'params': model_data.get('params', {}),
+        'search_leaderboard': model_data.get('search_leaderboard', []),
+        'dataset_hash': model_data.get('dataset_hash'),
+        'name': model_data.get('name')
+    }
+
+def load_model_metadata():
+    """Read the current model's metadata from its sidecar without loading the model"""
+    version = model_registry.get_current_version()
+    if version is None:
+        # Importing a legacy model makes it the current version
+        if load_model() is None:
+            return None
+        version = model_registry.get_current_version()
+    return model_registry.get_version_metadata(version)
+
+def _import_legacy_model():
+    """Publish a model saved by an older version (left in place) as the current registry version"""
     try:
-        with open(MODEL_PATH, 'rb') as f:
-            return pickle.load(f)
+        if os.path.isdir(LEGACY_MODEL_DIR):
+            model_data = load_artifact(LEGACY_MODEL_DIR)
+        elif os.path.exists(LEGACY_MODEL_PATH):
+            with open(LEGACY_MODEL_PATH, 'rb') as f:
+                model_data = pickle.load(f)
+        else:
+            return None
+        
+        preprocessor = model_data.get('preprocessor')
+        if preprocessor is None:
+            # Pickles from before the preprocessor was saved only kept the encoders
+            print("⚠️ Legacy model has no saved clusterer: cluster labels will be refit on "
+                  "every dataset it predicts, as that version did (retrain to fix)")
+            preprocessor = {
+                'le_state': model_data.get('le_state'),
+                'le_dist': model_data.get('le_dist'),
+                'refit_clusterer': True
+            }
+        model_data.setdefault('version', uuid.uuid4().hex)
+        if model_registry.version_exists(model_data['version']):
+            return model_registry.set_current(model_data['version'])
+        print(f"📦 Importing legacy model into {model_registry.REGISTRY_DIR}")
+        return model_registry.publish(model_data['model'], preprocessor, model_metadata(model_data))
     except Exception as e:
-        # If model is corrupted or incompatible, delete it and return None
-        try:
-            os.remove(MODEL_PATH)
-        except:
-            pass
+        # A corrupt or incompatible legacy file is reported but never deleted
+        print(f"Could not import legacy model: {e}")
         return None
 
-def make_predictions(df, feature_subset=None):
-    """Make predictions using the loaded model"""
+def load_model(force_reload=False):
+    """Load the current registry version, reusing the cached copy until the current version changes"""
+    version = model_registry.get_current_version()
+    if version is None:
+        version = _import_legacy_model()
+    if version is None:
+        clear_model_cache()
+        return None
+    
+    with _MODEL_LOCK:
+        if not force_reload and _MODEL_CACHE['key'] == version:
+            return _MODEL_CACHE['data']
+        
+        try:
+            model_data = load_artifact(model_registry.version_dir(version))
+        except Exception as e:
+            # Leave the files alone: another version can be activated or rolled back to
+            print(f"Could not load model version {version}: {e}")
+            _MODEL_CACHE.update({'key': None, 'data': None, 'format': None, 'load_seconds': None})
+            return None
+        
+        model_data['version'] = version
+        _MODEL_CACHE.update({
+            'key': version,
+            'data': model_data,
+            'format': ' / '.join(filter(None, [model_data.get('artifact_format', 'pickle'), model_data.get('forest_mode')])),
+            'load_seconds': model_data.get('load_seconds')
+        })
+        return model_data
+
+def get_model_load_stats():
+    """How the current model was loaded: version, format, load time, artifact size and process RSS"""
+    with _MODEL_LOCK:
+        stats = {
+            'version': _MODEL_CACHE['key'],
+            'format': _MODEL_CACHE['format'],
+            'load_seconds': _MODEL_CACHE['load_seconds']
+        }
+    if stats['version'] is not None:
+        stats['artifact_mb'] = artifact_size_mb(model_registry.version_dir(stats['version']))
+    stats['rss_mb'] = process_rss_mb()
+    return stats
+
+def activate_model(version):
+    """Serve a previously trained registry version (no retraining)"""
+    model_registry.set_current(version)
+    return load_model()
+
+def rollback_model():
+    """Switch back to the previously current registry version; returns its id or None"""
+    version = model_registry.rollback()
+    if version is not None:
+        load_model()
+    return version
+
+def reload_model():
+    """Force the cached model to be re-read from disk"""
+    return load_model(force_reload=True)
+
+def clear_model_cache():
+    """Drop the cached model bundle"""
+    with _MODEL_LOCK:
+        _MODEL_CACHE.update({'key': None, 'data': None, 'format': None, 'load_seconds': None})
+
+def _predict_batch(model, X_batch):
+    """Predict one batch; forests are averaged tree by tree to avoid nested joblib pools"""
+    estimators = getattr(model, 'estimators_', None)
+    if isinstance(model, RandomForestRegressor) and estimators:
+        total = np.zeros(len(X_batch), dtype=np.float64)
+        for tree in estimators:
+            total += tree.predict(X_batch, check_input=False)
+        return total / len(estimators)
+    return model.predict(X_batch)
+
+def predict_in_batches(model, X, batch_rows=PREDICT_BATCH_ROWS, n_workers=None):
+    """
+    Predict X in fixed-size row batches on a thread pool, writing into one
+    preallocated float32 array. Tree traversal releases the GIL, so batches
+    run in parallel across cores while peak memory stays bounded per batch.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    n_rows = len(X)
+    output = np.empty(n_rows, dtype=np.float32)
+    starts = range(0, n_rows, batch_rows)
+    
+    def run(start):
+        stop = min(start + batch_rows, n_rows)
+        output[start:stop] = _predict_batch(model, X[start:stop])
+    
+    n_workers = n_workers or os.cpu_count() or 1
+    if len(starts) <= 1 or n_workers == 1:
+        for start in starts:
+            run(start)
+    else:
+        with ThreadPoolExecutor(max_workers=min(n_workers, len(starts))) as pool:
+            list(pool.map(run, starts))
+    return output
+
+def predict_activity(df, batch_rows=PREDICT_BATCH_ROWS, n_workers=None):
+    """Return predicted total_activity for every row of df as a float32 array"""
     model_data = load_model()
     
     if model_data is None:
@@ -172,50 +684,98 @@ def make_predictions(df, feature_subset=None):
     rf_model = model_data['model']
     features = model_data['features']
     
-    # Preprocess input data
-    df_processed, _, _ = preprocess_data(df)
+    # Preprocess input data with the encoders fitted at training time,
+    # carrying only the columns the pipeline reads
+    preprocessor = model_data['preprocessor']
+    inputs = df[[c for c in INPUT_COLUMNS if c in df.columns]]
+    df_processed, _ = preprocess_data(inputs, preprocessor)
     
     # Ensure all features exist
     for feat in features:
         if feat not in df_processed.columns:
             df_processed[feat] = 0
     
-    X = df_processed[features]
-    
-    # Predict (model outputs log-transformed values)
-    predictions_log = rf_model.predict(X)
-    
-    # Convert back from log scale
-    predictions = np.expm1(predictions_log)
-    
-    # Return predictions with metadata
-    result_df = df.copy()
-    result_df['predicted_activity'] = predictions
+    X = df_processed[features].to_numpy(dtype=np.float32)
+    del df_processed
     
+    # Predict (model outputs log-transformed values), converting back in place
+    predictions = predict_in_batches(rf_model, X, batch_rows, n_workers)
+    np.expm1(predictions, out=predictions)
+    return predictions
+
+def make_predictions(df, feature_subset=None):
+    """
+    Make predictions using the loaded model.
+    Returns a one-column 'predicted_activity' frame aligned to df.index and the raw array.
+    """
+    predictions = predict_activity(df)
+    result_df = pd.DataFrame({'predicted_activity': predictions}, index=df.index)
     return result_df, predictions
 
 def get_prediction_summary(df, predictions):
     """Generate summary statistics from predictions"""
     summary = {
-        "total_predicted": float(predictions.sum()),
-        "mean_predicted": float(predictions.mean()),
+        "total_predicted": float(predictions.sum(dtype=np.float64)),
+        "mean_predicted": float(predictions.mean(dtype=np.float64)),
         "max_predicted": float(predictions.max()),
         "min_predicted": float(predictions.min()),
-        "std_predicted": float(predictions.std())
+        "std_predicted": float(predictions.std(dtype=np.float64))
     }
     
     # Add state-wise predictions if state column exists
     if 'state' in df.columns:
-        state_predictions = df.copy()
-        state_predictions['predicted_activity'] = predictions
-        state_summary = state_predictions.groupby('state')['predicted_activity'].agg(['sum', 'mean']).to_dict()
+        state_predictions = pd.Series(predictions, index=df.index, dtype=np.float64)
+        state_summary = state_predictions.groupby(df['state'], observed=True).agg(['sum', 'mean']).to_dict()
         summary['by_state'] = state_summary
     
     return summary
 
-def get_model_metrics():
-    """Get stored model metrics from .pkl file"""
+def get_model_version(model_data=None):
+    """Return the registry version of the loaded model"""
+    if model_data is None:
+        model_data = load_model()
+    if model_data is None:
+        return None
+    return model_data.get('version')
+
+def get_cached_predictions(df):
+    """
+    Return (predictions, summary) for df, reusing results while neither the data
+    nor the model has changed. Raises ValueError if no model is trained.
+    """
     model_data = load_model()
-    if model_data and 'r2_score' in model_data and 'mae' in model_data:
-        return model_data['r2_score'], model_data['mae']
+    if model_data is None:
+        raise ValueError("Model not found. Please train the model first.")
+    
+    key = (dataset_fingerprint(df), get_model_version(model_data))
+    with _PREDICTION_LOCK:
+        cached = _PREDICTION_CACHE.get(key)
+        if cached is not None:
+            _PREDICTION_CACHE.move_to_end(key)
+            _PREDICTION_STATS['hits'] += 1
+            return cached
+        _PREDICTION_STATS['misses'] += 1
+    
+    predictions = predict_activity(df)
+    predictions.setflags(write=False)
+    summary = get_prediction_summary(df, predictions)
+    
+    with _PREDICTION_LOCK:
+        _PREDICTION_CACHE[key] = (predictions, summary)
+        while len(_PREDICTION_CACHE) > MAX_CACHED_PREDICTIONS:
+            _PREDICTION_CACHE.popitem(last=False)
+    return predictions, summary
+
+def get_prediction_cache_stats():
+    """Return hit/miss counters and size of the prediction cache"""
+    with _PREDICTION_LOCK:
+        stats = dict(_PREDICTION_STATS)
+        stats['size'] = len(_PREDICTION_CACHE)
+    return stats
+
+def get_model_metrics():
+    """Get stored model metrics from the metadata sidecar"""
+    metadata = load_model_metadata()
+    if metadata and metadata.get('r2_score') is not None and metadata.get('mae') is not None:
+        return metadata['r2_score'], metadata['mae']
     return None, None
@@ -0,0 +1,94 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Keyword sets checked against the lower-cased question (plain substring semantics)
+AADHAAR_KEYWORDS = [
+    "aadhaar", "aadhar", "uidai", "enrol", "enrollment", "update",
+    "demographic", "biometric", "state", "district", "activity",
+    "trend", "predict", "forecast", "age", "child", "adult",
+    "bank", "link", "mobile", "address", "document", "card",
+    "pan", "verification", "authentication", "otp", "maadhaar",
+    "e-aadhaar", "pvc", "center", "centre", "seva kendra"
+]
+
+# Non-Aadhaar topics that get a question rejected unless it names Aadhaar explicitly
+OFF_TOPIC_KEYWORDS = [
+    "ice cream", "movie", "game", "sport", "music", "food",
+    "recipe", "weather", "cricket", "football", "python",
+    "java", "programming", "coding", "machine learning", "ai",
+    "artificial intelligence", "deep learning", "neural"
+]
+
+DATA_KEYWORDS = [
+    'state', 'district', 'highest', 'lowest', 'most', 'least',
+    'predict', 'trend', 'activity', 'total', 'average', 'mean',
+    'maximum', 'minimum', 'data', 'statistics', 'stats', 'analysis',
+    'demographic', 'biometric', 'age group', 'region', 'compare',
+    'which', 'how many', 'how much', 'count', 'number'
+]
+
+STATE_KEYWORDS = ['state', 'highest', 'lowest', 'most', 'least']
+AGE_KEYWORDS = ['age', 'child', 'adult', 'demographic', 'young']
+BANK_LINK_KEYWORDS = ['bank', 'link', 'connect', 'mobile', 'pan']
+UPDATE_KEYWORDS = ['update', 'change', 'correction']
+DISTRICT_KEYWORDS = ['district', 'pincode', 'local']
+FORECAST_KEYWORDS = ['predict', 'forecast', 'future', 'next', 'projection', 'expected']
+
+# Only the detailed insight fallback looks at these
+INSIGHT_AGE_KEYWORDS = AGE_KEYWORDS + ['18']
+INSIGHT_UPDATE_KEYWORDS = UPDATE_KEYWORDS + ['address', 'name', 'photo']
+
+_ALL_KEYWORDS = sorted(
+    set(AADHAAR_KEYWORDS + OFF_TOPIC_KEYWORDS + DATA_KEYWORDS + INSIGHT_AGE_KEYWORDS
+        + BANK_LINK_KEYWORDS + INSIGHT_UPDATE_KEYWORDS + STATE_KEYWORDS
+        + DISTRICT_KEYWORDS + FORECAST_KEYWORDS),
+    key=lambda kw: (-len(kw), kw)
+)
+
+# A zero-width lookahead matches at every position, and longest-first
+# alternation reports the longest keyword starting there
+_KEYWORD_PATTERN = re.compile("(?=(" + "|".join(map(re.escape, _ALL_KEYWORDS)) + "))")
+
+# Keywords contained in each keyword (itself included). A keyword occurring
+# at some position is a prefix of the longest match there, so expanding the
+# matches with this closure yields exactly the keywords found by `kw in text`.
+_CONTAINED = {kw: frozenset(other for other in _ALL_KEYWORDS if other in kw) for kw in _ALL_KEYWORDS}
+
+QuestionTopics = namedtuple(
+    "QuestionTopics",
+    ["aadhaar_related", "data_question", "state", "age", "bank_link", "update",
+     "district", "forecast", "matched"]
+)
+
+
+def match_keywords(text):
+    """Every known keyword occurring in the lower-cased text, in one regex pass"""
+    matched = set()
+    for longest in {m.group(1) for m in _KEYWORD_PATTERN.finditer(text.lower())}:
+        matched |= _CONTAINED[longest]
+    return frozenset(matched)
+
+
+def any_keyword(matched, keywords):
+    """True if any of keywords is in the matched set"""
+    return not matched.isdisjoint(keywords)
+
+
+@lru_cache(maxsize=4096)
+def classify_question(question):
+    """Classify a question once into all routing/topic flags"""
+    matched = match_keywords(question or "")
+    named = "aadhaar" in matched or "aadhar" in matched
+    off_topic = any_keyword(matched, OFF_TOPIC_KEYWORDS) and not named
+    return QuestionTopics(
+        aadhaar_related=not off_topic and any_keyword(matched, AADHAAR_KEYWORDS),
+        data_question=any_keyword(matched, DATA_KEYWORDS),
+        state=any_keyword(matched, STATE_KEYWORDS),
+        age=any_keyword(matched, AGE_KEYWORDS),
+        bank_link=any_keyword(matched, BANK_LINK_KEYWORDS),
+        update=any_keyword(matched, UPDATE_KEYWORDS),
+        district=any_keyword(matched, DISTRICT_KEYWORDS),
+        forecast=any_keyword(matched, FORECAST_KEYWORDS),
+        matched=matched,
+    )